@@ -0,0 +1,340 @@
+#!/usr/bin/env python3
+"""
+html-to-pdf 性能基准
+生成可复现的合成HTML样例（短页面、10k/50k像素长页面、多图页面、中文长文），
+按渲染模式分别测量吞吐、延迟分位数、输出大小和峰值内存，并保存结果用于前后对比。
+
+每个模式在独立进程中运行，峰值内存互不干扰。
+
+用法:
+    python benchmark.py                              # 全部模式 × 全部样例，重复3次
+    python benchmark.py --modes raster vector --repeat 5
+    python benchmark.py --compare bench-results/20251101-120000.json
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from html_to_long_image import (
+    BrowserPool,
+    RenderOptions,
+    StreamingPNGWriter,
+    _convert_one,
+    _percentile,
+    _peak_rss_mb,
+)
+
+SCRIPT_DIR = Path(__file__).resolve().parent
+
+# 模式名 -> RenderOptions 参数
+MODES = {
+    'raster': {},
+    'tiled': {'capture': 'tiled'},
+    'vector': {'pdf_mode': 'vector'},
+    'jpeg': {'image_format': 'jpeg', 'pdf_image': 'jpeg'},
+}
+
+FIXTURE_SEED = 20251023
+
+PAGE_TEMPLATE = """<!DOCTYPE html>
+<html lang="{lang}">
+<head>
+<meta charset="utf-8">
+<title>{title}</title>
+<style>
+  body {{ margin: 0; font-family: -apple-system, "PingFang SC", "Noto Sans CJK SC", sans-serif; }}
+  .section {{ padding: 40px 60px; border-bottom: 1px solid #ddd; }}
+  .section h2 {{ color: #1a3d7c; }}
+  .block {{ height: {block_height}px; background: linear-gradient(#f5f7fb, #e3e9f5); }}
+  .gallery img {{ width: 100%; display: block; margin: 16px 0; }}
+</style>
+</head>
+<body>
+{body}
+</body>
+</html>
+"""
+
+LATIN_WORDS = ("revenue growth market customer platform latency throughput pipeline "
+               "quarter forecast margin retention analysis strategy product roadmap").split()
+CJK_CHARS = ("的一是在不了有和人这中大为上个国我以要他时来用们生到作地于出就分对成会可主发年动"
+             "同工也能下过子说产种面而方后多定行学法所民得经十三之进着等部度家电力里如水化高自"
+             "二理起小物现实加量都两体制机当使点从业本去把性好应开它合还因由其些然前外天政四日")
+
+
+def _latin_paragraph(rng: random.Random, words: int = 80) -> str:
+    return ' '.join(rng.choice(LATIN_WORDS) for _ in range(words)).capitalize() + '.'
+
+
+def _cjk_paragraph(rng: random.Random, chars: int = 240) -> str:
+    text = ''.join(rng.choice(CJK_CHARS) for _ in range(chars))
+    return '，'.join(text[i:i + 16] for i in range(0, len(text), 16)) + '。'
+
+
+def _write_gradient_png(path: str, width: int, height: int, seed: int):
+    """写出一张确定性的渐变PNG，作为多图样例的图片资源。"""
+    writer = StreamingPNGWriter(path, width, compress_level=6)
+    template = bytearray(width * 3)
+    template[0::3] = bytes((x + seed * 37) % 256 for x in range(width))
+    template[2::3] = bytes([seed * 53 % 256]) * width
+    rows = bytearray()
+    for y in range(height):
+        row = bytearray(template)
+        row[1::3] = bytes([(y + seed * 11) % 256]) * width
+        rows += row
+    writer.write_rows(bytes(rows), height)
+    writer.close()
+
+
+def _sections(rng: random.Random, total_height: int, paragraph, title: str) -> str:
+    """生成总高度约为 total_height 像素的章节。"""
+    parts = []
+    block_height = 400
+    for index in range(max(1, total_height // (block_height + 300))):
+        parts.append(f'<div class="section"><h2>{title} {index + 1}</h2>'
+                     f'<p>{paragraph(rng)}</p><div class="block"></div></div>')
+    return '\n'.join(parts)
+
+
+def generate_fixtures(fixture_dir: str) -> dict:
+    """
+    生成基准样例（内容由固定随机种子决定）。
+
+    HTML和图片每次都重新写出并覆盖已有文件，修改尺寸或种子后不会沿用旧样例。
+
+    Returns:
+        样例名 -> HTML路径
+    """
+    os.makedirs(fixture_dir, exist_ok=True)
+    rng = random.Random(FIXTURE_SEED)
+    pages = {
+        'short': ('en', _sections(rng, 1200, _latin_paragraph, 'Section')),
+        'tall_10k': ('en', _sections(rng, 10000, _latin_paragraph, 'Section')),
+        'tall_50k': ('en', _sections(rng, 50000, _latin_paragraph, 'Section')),
+        'cjk': ('zh-CN', '\n'.join(
+            f'<div class="section"><h2>第{i + 1}章</h2>'
+            + ''.join(f'<p>{_cjk_paragraph(rng)}</p>' for _ in range(6)) + '</div>'
+            for i in range(30))),
+    }
+
+    image_dir = os.path.join(fixture_dir, 'images')
+    os.makedirs(image_dir, exist_ok=True)
+    images = []
+    for index in range(24):
+        name = f'img_{index:02d}.png'
+        path = os.path.join(image_dir, name)
+        _write_gradient_png(path, 960, 480, index)
+        images.append(f'<img loading="lazy" src="images/{name}" width="960" height="480">')
+    pages['image_heavy'] = ('en', '<div class="section gallery"><h2>Gallery</h2>'
+                                  + '\n'.join(images) + '</div>')
+
+    fixtures = {}
+    for name, (lang, body) in pages.items():
+        path = os.path.join(fixture_dir, f'{name}.html')
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(PAGE_TEMPLATE.format(lang=lang, title=name, block_height=400, body=body))
+        fixtures[name] = path
+    return fixtures
+
+
+def _children_peak_rss_mb() -> float:
+    """已退出子进程（Chromium等）中最大的峰值常驻内存（MB）。"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def _summarize(values: list) -> dict:
+    return {
+        'mean': round(sum(values) / len(values), 4),
+        'p50': round(_percentile(values, 0.50), 4),
+        'p95': round(_percentile(values, 0.95), 4),
+        'max': round(max(values), 4),
+    }
+
+
+def run_mode(mode: str, fixtures: dict, repeat: int, output_dir: str) -> dict:
+    """
+    在当前进程中用一个浏览器池跑完一个模式的全部样例。
+
+    每个样例先预热一次（不计入统计），再重复渲染 repeat 次。
+    """
+    options = RenderOptions(**MODES[mode])
+    os.makedirs(output_dir, exist_ok=True)
+    per_fixture = {name: [] for name in fixtures}
+    errors = []
+
+    launch_start = time.perf_counter()
+    with BrowserPool(pool_size=1) as pool:
+        browser_launch = time.perf_counter() - launch_start
+        for name, path in fixtures.items():
+            _convert_one(pool, path, output_dir, True, options, None)
+
+        start = time.perf_counter()
+        for _ in range(repeat):
+            for name, path in fixtures.items():
+                result = _convert_one(pool, path, output_dir, True, options, None)
+                if result['ok']:
+                    per_fixture[name].append(result)
+                else:
+                    errors.append(f"{name}: {result['error']}")
+        wall_seconds = time.perf_counter() - start
+    completed = sum(len(results) for results in per_fixture.values())
+
+    report = {
+        'options': MODES[mode],
+        'browser_launch_seconds': round(browser_launch, 4),
+        'wall_seconds': round(wall_seconds, 4),
+        'renders': completed,
+        'throughput_per_s': round(completed / wall_seconds, 3) if wall_seconds else None,
+        'peak_rss_mb': _peak_rss_mb(),
+        'browser_peak_rss_mb': _children_peak_rss_mb(),
+        'errors': errors,
+        'fixtures': {},
+    }
+    for name, results in per_fixture.items():
+        if not results:
+            continue
+        last = results[-1]
+        stage_names = {stage for r in results for stage in r['profile']['stages']}
+        report['fixtures'][name] = {
+            'latency': _summarize([r['seconds'] for r in results]),
+            'stages': {stage: _summarize([r['profile']['stages'].get(stage, 0.0)
+                                          for r in results])['mean']
+                       for stage in sorted(stage_names)},
+            'page_height': last['profile'].get('page_height'),
+            'image_bytes': last.get('image_bytes'),
+            'pdf_bytes': last.get('pdf_bytes'),
+        }
+    return report
+
+
+def _run_mode_isolated(mode: str, fixtures: dict, repeat: int, output_dir: str) -> dict:
+    """在新进程中运行一个模式，使峰值内存只反映该模式。"""
+    ctx = multiprocessing.get_context('spawn')
+    with ctx.Pool(1) as worker:
+        return worker.apply(run_mode, (mode, fixtures, repeat, output_dir))
+
+
+def _environment() -> dict:
+    try:
+        from importlib.metadata import version
+        playwright_version = version('playwright')
+    except Exception:
+        playwright_version = None
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=SCRIPT_DIR,
+                                capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'cpu_count': os.cpu_count(),
+        'playwright': playwright_version,
+        'git_commit': commit,
+    }
+
+
+def print_results(results: dict):
+    """打印每个模式、每个样例的延迟、输出大小和内存。"""
+    for mode, report in results['modes'].items():
+        print(f"\n▶ {mode}  吞吐 {report['throughput_per_s']} 个/秒，"
+              f"浏览器启动 {report['browser_launch_seconds']:.2f} 秒，"
+              f"峰值RSS {report['peak_rss_mb'] or 0:.0f} MB"
+              f"（浏览器 {report['browser_peak_rss_mb'] or 0:.0f} MB）")
+        print(f"   {'fixture':<12}{'height':>8}{'p50 s':>9}{'p95 s':>9}{'image KB':>11}{'pdf KB':>10}")
+        for name, fixture in report['fixtures'].items():
+            latency = fixture['latency']
+            image_kb = (fixture['image_bytes'] or 0) / 1024
+            pdf_kb = (fixture['pdf_bytes'] or 0) / 1024
+            print(f"   {name:<12}{fixture['page_height'] or 0:>8}{latency['p50']:>9.3f}"
+                  f"{latency['p95']:>9.3f}{image_kb:>11.0f}{pdf_kb:>10.0f}")
+        for error in report['errors']:
+            print(f"   ❌ {error}")
+
+
+def _change(new, old) -> str:
+    if not new or not old:
+        return '       -'
+    return f"{(new - old) / old * 100:>+7.1f}%"
+
+
+def print_comparison(results: dict, baseline: dict):
+    """与之前保存的结果对比 p50 延迟和输出大小（正数表示变慢/变大）。"""
+    print(f"\n📊 对比基线 {baseline['environment'].get('git_commit')} "
+          f"({baseline['environment'].get('timestamp')}):")
+    print(f"   {'mode/fixture':<22}{'p50':>9}{'image':>9}{'pdf':>9}")
+    for mode, report in results['modes'].items():
+        old_report = baseline['modes'].get(mode)
+        if not old_report:
+            continue
+        print(f"   {mode:<22}吞吐 {_change(report['throughput_per_s'], old_report['throughput_per_s'])}")
+        for name, fixture in report['fixtures'].items():
+            old = old_report['fixtures'].get(name)
+            if not old:
+                continue
+            print(f"   {'  ' + name:<22}"
+                  f"{_change(fixture['latency']['p50'], old['latency']['p50']):>9}"
+                  f"{_change(fixture['image_bytes'], old['image_bytes']):>9}"
+                  f"{_change(fixture['pdf_bytes'], old['pdf_bytes']):>9}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='html-to-pdf 渲染性能基准')
+    parser.add_argument('--modes', nargs='+', choices=sorted(MODES), default=list(MODES),
+                        help='要测量的渲染模式（默认: 全部）')
+    parser.add_argument('--fixtures', nargs='+',
+                        choices=['short', 'tall_10k', 'tall_50k', 'image_heavy', 'cjk'],
+                        help='要使用的样例（默认: 全部）')
+    parser.add_argument('--repeat', type=int, default=3, help='每个样例的计时渲染次数（默认: 3）')
+    parser.add_argument('--fixture-dir', default=os.path.join(tempfile.gettempdir(),
+                                                              'html-to-pdf-bench'),
+                        help='样例与输出目录（默认: %(default)s）')
+    parser.add_argument('--output', help='结果JSON路径（默认: bench-results/<时间戳>.json）')
+    parser.add_argument('--compare', help='与之前保存的结果JSON对比')
+    return parser.parse_args(argv)
+
+
+def main():
+    args = parse_args()
+    fixtures = generate_fixtures(os.path.join(args.fixture_dir, 'fixtures'))
+    if args.fixtures:
+        fixtures = {name: fixtures[name] for name in args.fixtures}
+
+    print(f"🏁 基准: {len(args.modes)} 个模式 × {len(fixtures)} 个样例 × {args.repeat} 次")
+    results = {'environment': _environment(), 'repeat': args.repeat, 'modes': {}}
+    for mode in args.modes:
+        print(f"⏳ 运行模式 {mode}...")
+        results['modes'][mode] = _run_mode_isolated(
+            mode, fixtures, args.repeat, os.path.join(args.fixture_dir, 'output', mode))
+
+    print_results(results)
+
+    output = args.output or os.path.join('bench-results', time.strftime('%Y%m%d-%H%M%S') + '.json')
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+    print(f"\n📝 结果已保存: {output}")
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            print_comparison(results, json.load(f))
+
+
+if __name__ == '__main__':
+    main()
@@ -2,25 +2,434 @@
 """
 HTML转长图工具
 将HTML渲染为一张完整的长图（PNG），然后可以转PDF
+
+支持批量模式：一次启动Chromium，在多个文件之间复用浏览器上下文和页面。
 """
 
+import argparse
+import fnmatch
+import glob
+import hashlib
+import json
 import os
+import re
+import shutil
 import sys
 import time
+import zlib
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, replace
 from pathlib import Path
+from urllib.parse import urlsplit
+
+
+DEFAULT_VIEWPORT = {'width': 1200, 'height': 800}
+
+# 禁用动画并强制显示内容的样式
+DISABLE_ANIMATION_CSS = """
+    *, *::before, *::after {
+        animation: none !important;
+        transition: none !important;
+    }
+    .section, .cover {
+        opacity: 1 !important;
+        transform: none !important;
+    }
+"""
+
+FORCE_VISIBLE_JS = """
+    () => {
+        document.querySelectorAll('.section, .cover').forEach(el => {
+            el.style.opacity = '1';
+            el.style.transform = 'none';
+        });
+    }
+"""
+
+
+# 逐屏滚动触发懒加载（IntersectionObserver），每屏等待两帧让观察者回调执行。
+# 只滚到开始时的页面高度，且最多 timeoutMs 毫秒，无限滚动的页面也能结束
+SCROLL_THROUGH_JS = """
+    async (timeoutMs) => {
+        const frame = () => new Promise(resolve => {
+            requestAnimationFrame(() => requestAnimationFrame(resolve));
+            setTimeout(resolve, 50);
+        });
+        const deadline = Date.now() + timeoutMs;
+        const height = document.body.scrollHeight;
+        const step = Math.max(window.innerHeight, 1);
+        for (let y = 0; y < height && Date.now() < deadline; y += step) {
+            window.scrollTo(0, y);
+            await frame();
+        }
+        window.scrollTo(0, 0);
+        await frame();
+        return document.body.scrollHeight;
+    }
+"""
+
+# 等待字体就绪以及所有未完成的图片加载/失败，最多等待 timeoutMs 毫秒
+WAIT_ASSETS_JS = """
+    async (timeoutMs) => {
+        const pending = Array.from(document.images).filter(img => !img.complete);
+        const settled = Promise.all([
+            document.fonts ? document.fonts.ready : Promise.resolve(),
+            ...pending.map(img => new Promise(resolve => {
+                img.addEventListener('load', resolve, { once: true });
+                img.addEventListener('error', resolve, { once: true });
+            })),
+        ]).then(() => true);
+        const timeout = new Promise(resolve => setTimeout(() => resolve(false), timeoutMs));
+        return Promise.race([settled, timeout]);
+    }
+"""
 
 
-def html_to_long_image(html_path: str, output_path: str = None) -> str:
+@dataclass
+class RenderOptions:
     """
-    将HTML转换为一张完整的长图PNG。
+    单个页面的渲染选项。
 
-    Args:
-        html_path: HTML文件路径
-        output_path: 输出图片路径（可选）
+    Attributes:
+        load_timeout: 等待懒加载内容（图片、字体、网络请求）的最长时间（秒）
+        network_quiet: 判定网络空闲所需的无请求时长（秒）
+        capture: 截图方式，'full' 一次截取整页，'tiled' 按条带截取并流式写出
+        tile_height: 平铺截图的条带高度（像素，默认等于视口高度）
+        pdf_mode: PDF生成方式，'raster' 由长图转换，'vector' 由Chromium直接打印为
+            单页矢量PDF（页高等于页面 scrollHeight，文字可搜索）
+        image_format: 长图格式，'png'、'png-optimized'（无损最优压缩）、'jpeg' 或 'webp'
+        image_quality: JPEG/WebP 的质量（1-100，WebP 取 100 时为无损）
+        pdf_image: PDF内图片的编码，'flate' 无损；'jpeg' 以 DCTDecode 嵌入JPEG
+            （长图本身是JPEG时直接嵌入，不重新编码）
+        wait_until: page.goto 的就绪条件，'networkidle'、'load'、'domcontentloaded'
+            或 'commit'
+        ready_selector: 截图前等待出现的CSS选择器（可选，如 '#charts-ready'）
+        ready_function: 截图前等待返回真值的JS表达式（可选，如 'window.chartsReady'）
+        network: 'allow' 正常访问网络；'offline' 立即拒绝所有远程请求（allow 中的除外），
+            离线环境下不会卡在超时上
+        block: 需要拦截的URL规则（主机名如 'example.com' 匹配其所有子域名，
+            其余按通配符匹配完整URL）
+        allow: network='offline' 时仍放行的远程URL规则（写法同 block）
+        block_trackers: 是否拦截常见统计分析与广告追踪域名（见 TRACKER_HOSTS）
+        font_dir: 本地字体目录，远程字体请求按文件名从该目录直接返回
+        asset_cache: 远程资源（字体、CDN上的CSS/JS等）的磁盘缓存目录（可选），
+            命中时直接由本地响应，不再下载
+        asset_ttl: 资源缓存的有效期（秒，响应的 Cache-Control max-age 更短时以其为准）；
+            过期后重新下载，下载失败或 network='offline' 时仍使用过期副本
+        asset_cache_mb: 资源缓存的最大占用（MB），超出后按最近使用时间淘汰
+    """
+    load_timeout: float = 10.0
+    network_quiet: float = 0.05
+    capture: str = 'full'
+    tile_height: int = None
+    pdf_mode: str = 'raster'
+    image_format: str = 'png'
+    image_quality: int = 85
+    pdf_image: str = 'flate'
+    wait_until: str = 'networkidle'
+    ready_selector: str = None
+    ready_function: str = None
+    network: str = 'allow'
+    block: tuple = ()
+    allow: tuple = ()
+    block_trackers: bool = False
+    font_dir: str = None
+    asset_cache: str = None
+    asset_ttl: float = 7 * 24 * 3600
+    asset_cache_mb: float = 512
 
-    Returns:
-        生成的图片路径
+
+WAIT_UNTIL_CHOICES = ('networkidle', 'load', 'domcontentloaded', 'commit')
+
+# 常见统计分析、广告与追踪服务的域名（含子域名）
+TRACKER_HOSTS = (
+    'google-analytics.com', 'googletagmanager.com', 'googleadservices.com',
+    'doubleclick.net', 'googlesyndication.com', 'facebook.net', 'connect.facebook.com',
+    'hotjar.com', 'segment.io', 'segment.com', 'mixpanel.com', 'amplitude.com',
+    'clarity.ms', 'sentry.io', 'newrelic.com', 'nr-data.net', 'plausible.io',
+    'hm.baidu.com', 'cnzz.com', 'umeng.com', 'growingio.com', 'sensorsdata.cn',
+)
+
+FONT_EXTENSIONS = ('.woff2', '.woff', '.ttf', '.otf', '.eot')
+
+# 本地响应的字体需跨域可用（@font-face 按CORS加载）
+FULFILL_HEADERS = {'Access-Control-Allow-Origin': '*'}
+
+# 页面内不经过网络的URL
+LOCAL_SCHEMES = ('file', 'data', 'blob', 'about', 'chrome', 'chrome-extension')
+
+
+DEFAULT_ASSET_CACHE_DIR = os.path.join(
+    os.environ.get('XDG_CACHE_HOME', os.path.expanduser('~/.cache')), 'html-to-pdf', 'assets')
+
+# 资源缓存中不保存的响应头（正文已解码，长度由 fulfill 重新计算）
+UNCACHED_HEADERS = ('content-encoding', 'content-length', 'transfer-encoding', 'set-cookie',
+                    'connection', 'keep-alive', 'date')
+
+# 资源缓存只保存这些类型的请求；页面文档、XHR/fetch 等动态数据每次都走网络
+CACHEABLE_RESOURCE_TYPES = ('font', 'stylesheet', 'script', 'image')
+
+
+def _evict_lru(cache_dir: str, max_bytes: int):
+    """删除 cache_dir 中最久未使用（mtime 最旧）的文件，直到总大小不超过 max_bytes。"""
+    entries = []
+    total = 0
+    for entry in os.scandir(cache_dir):
+        if not entry.is_file() or entry.name.endswith('.tmp'):
+            continue
+        stat = entry.stat()
+        entries.append((stat.st_mtime, stat.st_size, entry.path))
+        total += stat.st_size
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+        except OSError:
+            continue
+        total -= size
+
+
+def _cache_lifetime(headers: dict, ttl: float):
+    """
+    按响应的 Cache-Control 计算缓存有效期（秒）。
+
+    no-store / private 的响应不缓存，返回 None；no-cache 要求每次重新验证，
+    有效期为 0（仍可作为离线或下载失败时的过期副本）；max-age 不超过 ttl。
     """
+    value = next((v for k, v in headers.items() if k.lower() == 'cache-control'), '')
+    lifetime = ttl
+    for directive in value.lower().split(','):
+        name, _, arg = directive.strip().partition('=')
+        if name in ('no-store', 'private'):
+            return None
+        if name == 'no-cache':
+            lifetime = 0
+        elif name == 'max-age':
+            try:
+                lifetime = min(lifetime, max(0, int(arg.strip().strip('"'))))
+            except ValueError:
+                lifetime = 0
+    return lifetime
+
+
+def _write_atomic(path: str, data: bytes):
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, 'wb') as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+class AssetCache:
+    """
+    远程资源的持久化磁盘缓存，按URL保存响应正文和响应头。
+    有效期取 ttl 与响应 Cache-Control 的 max-age 中较小者，no-store / private 的响应不保存。
+
+    每个条目是 <sha256(url)>.body 与 <sha256(url)>.json 两个文件，命中时刷新 mtime；
+    总大小超过 max_bytes 时按最近使用时间淘汰。多个进程可以共享同一目录
+    （写入先落临时文件再原子替换）。
+    """
+
+    def __init__(self, cache_dir: str = DEFAULT_ASSET_CACHE_DIR, ttl: float = 7 * 24 * 3600,
+                 max_bytes: int = 512 << 20):
+        self.cache_dir = cache_dir
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.stored = 0
+
+    def _entry(self, url: str) -> str:
+        return os.path.join(self.cache_dir, hashlib.sha256(url.encode()).hexdigest())
+
+    def lookup(self, url: str, allow_stale: bool = False) -> dict:
+        """
+        返回 {'path', 'status', 'headers', 'fresh'}；未缓存，或已过期且不允许
+        使用过期副本时返回 None。
+        """
+        entry = self._entry(url)
+        try:
+            with open(entry + '.json', encoding='utf-8') as f:
+                meta = json.load(f)
+            os.utime(entry + '.body')
+            os.utime(entry + '.json')
+        except (OSError, ValueError):
+            return None
+        fresh = time.time() - meta['stored_at'] < meta.get('max_age', self.ttl)
+        if not fresh and not allow_stale:
+            return None
+        return {'path': entry + '.body', 'status': meta['status'],
+                'headers': meta['headers'], 'fresh': fresh}
+
+    def store(self, url: str, status: int, headers: dict, body: bytes):
+        """保存一个响应（正文先于元数据写入，读到元数据即说明正文完整）。"""
+        entry = self._entry(url)
+        max_age = _cache_lifetime(headers, self.ttl)
+        if max_age is None:
+            # 不允许缓存：同时删除之前保存的副本
+            for suffix in ('.json', '.body'):
+                try:
+                    os.remove(entry + suffix)
+                except OSError:
+                    pass
+            return
+        os.makedirs(self.cache_dir, exist_ok=True)
+        headers = {k: v for k, v in headers.items() if k.lower() not in UNCACHED_HEADERS}
+        meta = {'url': url, 'status': status, 'headers': headers, 'stored_at': time.time(),
+                'max_age': max_age}
+        _write_atomic(entry + '.body', body)
+        _write_atomic(entry + '.json', json.dumps(meta, ensure_ascii=False).encode())
+        self.stored += 1
+
+    def evict(self):
+        """按最近使用时间淘汰，直到缓存总大小不超过 max_bytes。"""
+        if os.path.isdir(self.cache_dir):
+            _evict_lru(self.cache_dir, self.max_bytes)
+
+
+def _url_matches(url: str, host: str, pattern: str) -> bool:
+    """主机名规则匹配该主机及其子域名；含 '/' 或 '*' 的规则按通配符匹配完整URL。"""
+    if '/' in pattern or '*' in pattern or '?' in pattern:
+        return fnmatch.fnmatchcase(url, pattern)
+    pattern = pattern.lower()
+    return host == pattern or host.endswith('.' + pattern)
+
+
+class RequestRules:
+    """
+    根据 RenderOptions 决定页面发出的每个请求如何处理。
+
+    decide() 返回 ('continue', None)、('abort', None)、('fulfill', 响应) 或
+    ('fetch', 过期副本)；响应为包含 path、headers（及可选 status）的字典。'fetch' 表示
+    由路由处理函数下载后调用 store() 写入资源缓存，下载失败时改用过期副本。
+    本类不依赖Playwright，同步和异步渲染共用，由各自的路由处理函数执行决定。
+    """
+
+    def __init__(self, options: RenderOptions):
+        self.block = tuple(options.block or ())
+        self.allow = tuple(options.allow or ())
+        self.offline = options.network == 'offline'
+        self.block_trackers = options.block_trackers
+        self.fonts = {}
+        if options.font_dir:
+            for root, _, files in os.walk(options.font_dir):
+                for name in files:
+                    if name.lower().endswith(FONT_EXTENSIONS):
+                        self.fonts.setdefault(name, os.path.join(root, name))
+        self.assets = None
+        if options.asset_cache:
+            self.assets = AssetCache(options.asset_cache, options.asset_ttl,
+                                     int(options.asset_cache_mb * 1024 * 1024))
+        self.blocked = 0
+        self.served = 0
+
+    @classmethod
+    def for_options(cls, options: RenderOptions):
+        """没有任何拦截规则时返回 None，此时不启用路由（保留浏览器HTTP缓存）。"""
+        if (options.block or options.block_trackers or options.font_dir
+                or options.asset_cache or options.network == 'offline'):
+            return cls(options)
+        return None
+
+    def decide(self, url: str, resource_type: str = None, method: str = 'GET') -> tuple:
+        parts = urlsplit(url)
+        if parts.scheme in LOCAL_SCHEMES:
+            return 'continue', None
+        host = (parts.hostname or '').lower()
+
+        if any(_url_matches(url, host, pattern) for pattern in self.block):
+            self.blocked += 1
+            return 'abort', None
+        if self.block_trackers and any(_url_matches(url, host, pattern)
+                                       for pattern in TRACKER_HOSTS):
+            self.blocked += 1
+            return 'abort', None
+
+        name = os.path.basename(parts.path)
+        if name in self.fonts and (resource_type in (None, 'font')
+                                   or name.lower().endswith(FONT_EXTENSIONS)):
+            self.served += 1
+            return 'fulfill', {'path': self.fonts[name], 'headers': FULFILL_HEADERS}
+
+        cacheable = (self.assets is not None and method == 'GET'
+                     and parts.scheme in ('http', 'https')
+                     and resource_type in (None,) + CACHEABLE_RESOURCE_TYPES)
+        cached = self.assets.lookup(url, allow_stale=True) if cacheable else None
+        if cached is not None and (cached['fresh'] or self.offline):
+            self.assets.hits += 1
+            self.served += 1
+            return 'fulfill', cached
+
+        if self.offline and not any(_url_matches(url, host, pattern) for pattern in self.allow):
+            self.blocked += 1
+            return 'abort', None
+        if cacheable:
+            self.assets.misses += 1
+            return 'fetch', cached
+        return 'continue', None
+
+    def store(self, url: str, status: int, headers: dict, body: bytes):
+        """把下载到的成功响应写入资源缓存。"""
+        if 200 <= status < 300:
+            self.assets.store(url, status, headers, body)
+
+    def finish(self, profile: 'RenderProfile' = None):
+        """渲染结束后记录统计，并在有新写入时淘汰资源缓存。"""
+        if self.assets is not None and self.assets.stored:
+            self.assets.evict()
+        if profile is not None:
+            profile.record(requests_blocked=self.blocked, requests_served_locally=self.served)
+            if self.assets is not None:
+                profile.record(asset_cache_hits=self.assets.hits,
+                               asset_cache_misses=self.assets.misses)
+
+    def handle(self, route):
+        """Playwright同步API的路由处理函数。"""
+        request = route.request
+        action, payload = self.decide(request.url, request.resource_type, request.method)
+        if action == 'abort':
+            route.abort('blockedbyclient')
+        elif action == 'fulfill':
+            route.fulfill(status=payload.get('status', 200), path=payload['path'],
+                          headers=payload['headers'])
+        elif action == 'fetch':
+            try:
+                response = route.fetch()
+                body = response.body()
+            except Exception:
+                if payload is None:
+                    route.abort('failed')
+                    return
+                # 下载失败时使用过期副本
+                route.fulfill(status=payload['status'], path=payload['path'],
+                              headers=payload['headers'])
+                return
+            self.store(request.url, response.status, response.headers, body)
+            route.fulfill(response=response, body=body)
+        else:
+            route.continue_()
+
+
+# 长图格式 -> 文件后缀
+IMAGE_FORMATS = {'png': '.png', 'png-optimized': '.png', 'jpeg': '.jpg', 'webp': '.webp'}
+
+# WebP 单边最大像素
+WEBP_MAX_DIMENSION = 16383
+
+
+# PDF中图片的分辨率（与 image_to_pdf 保持一致）
+PDF_RESOLUTION = 100.0
+
+PAGE_SIZE_JS = """
+    () => [
+        Math.max(document.documentElement.scrollWidth, document.body.scrollWidth),
+        Math.max(document.documentElement.scrollHeight, document.body.scrollHeight),
+    ]
+"""
+
+
+def _import_sync_playwright():
+    """导入Playwright同步API，缺失时自动安装。"""
     try:
         from playwright.sync_api import sync_playwright
     except ImportError:
@@ -28,65 +437,808 @@ def html_to_long_image(html_path: str, output_path: str = None) -> str:
         import subprocess
         subprocess.check_call([sys.executable, "-m", "pip", "install", "playwright", "-q"])
         from playwright.sync_api import sync_playwright
+    return sync_playwright
+
+
+def _import_pil_image():
+    """导入Pillow的Image模块，缺失时自动安装。"""
+    try:
+        from PIL import Image
+    except ImportError:
+        print("正在安装 Pillow...")
+        import subprocess
+        subprocess.check_call([sys.executable, "-m", "pip", "install", "Pillow", "-q"])
+        from PIL import Image
+    return Image
+
+
+def _peak_rss_mb() -> float:
+    """返回当前Python进程的峰值常驻内存（MB），平台不支持时返回 None。"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux 以 KB 为单位，macOS 以字节为单位
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def _browser_rss_mb() -> float:
+    """
+    返回当前进程所有子进程（Chromium及Playwright驱动）的常驻内存之和（MB）。
+
+    依赖可选的 psutil，未安装时返回 None。
+    """
+    try:
+        import psutil
+    except ImportError:
+        return None
+    total = 0
+    for child in psutil.Process().children(recursive=True):
+        try:
+            total += child.memory_info().rss
+        except psutil.Error:
+            continue
+    return total / (1024 * 1024)
+
+
+class RenderProfile:
+    """
+    单个文件转换的分阶段耗时与资源指标。
+
+    用法:
+        profile = RenderProfile("a.html")
+        with profile.stage('goto'):
+            page.goto(...)
+        profile.record(page_height=12000)
+    """
+
+    def __init__(self, input_path: str = None):
+        self.input = input_path
+        self.stages = {}
+        self.metrics = {}
+        self._start = time.perf_counter()
+
+    @contextmanager
+    def stage(self, name: str):
+        """统计 with 块的耗时，同名阶段累加。"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[name] = self.stages.get(name, 0.0) + time.perf_counter() - start
+
+    def record(self, **metrics):
+        """记录资源指标（页面尺寸、位图大小、内存等），值为 None 的忽略。"""
+        self.metrics.update({k: v for k, v in metrics.items() if v is not None})
+
+    def to_dict(self) -> dict:
+        return {
+            'input': self.input,
+            'wall_seconds': round(time.perf_counter() - self._start, 4),
+            'stages': {name: round(seconds, 4) for name, seconds in self.stages.items()},
+            **self.metrics,
+        }
+
+
+class StreamingPNGWriter:
+    """
+    逐行写出RGB PNG，内存中只保留当前条带。
+
+    图片高度在写入过程中累加，close() 时回写到 IHDR。
+    """
+
+    def __init__(self, path: str, width: int, compress_level: int = 6):
+        self.width = width
+        self.height = 0
+        self._file = open(path, 'wb')
+        self._compressor = zlib.compressobj(compress_level)
+        self._buffer = bytearray()
+        self._file.write(b'\x89PNG\r\n\x1a\n')
+        self._ihdr_offset = self._file.tell()
+        self._write_chunk(b'IHDR', self._ihdr())
+
+    def _ihdr(self) -> bytes:
+        # 8位RGB，无隔行扫描
+        return (self.width.to_bytes(4, 'big') + self.height.to_bytes(4, 'big')
+                + bytes([8, 2, 0, 0, 0]))
+
+    def _write_chunk(self, chunk_type: bytes, data: bytes):
+        self._file.write(len(data).to_bytes(4, 'big'))
+        self._file.write(chunk_type)
+        self._file.write(data)
+        self._file.write(zlib.crc32(chunk_type + data).to_bytes(4, 'big'))
+
+    def write_rows(self, rgb: bytes, rows: int):
+        """写入 rows 行原始RGB数据（每行 width*3 字节）。"""
+        stride = self.width * 3
+        for row in range(rows):
+            self._buffer += self._compressor.compress(
+                b'\x00' + rgb[row * stride:(row + 1) * stride])
+            if len(self._buffer) >= 1 << 16:
+                self._write_chunk(b'IDAT', bytes(self._buffer))
+                self._buffer.clear()
+        self.height += rows
+
+    def close(self):
+        self._buffer += self._compressor.flush()
+        if self._buffer:
+            self._write_chunk(b'IDAT', bytes(self._buffer))
+        self._write_chunk(b'IEND', b'')
+        self._file.seek(self._ihdr_offset)
+        self._write_chunk(b'IHDR', self._ihdr())
+        self._file.close()
+
+
+class StreamingPDFWriter:
+    """
+    由多个图片条带自上而下拼接成一页长PDF，每个条带写完即释放。
+
+    条带数据需已编码（如 FlateDecode 压缩的原始像素），页面尺寸在 close() 时确定。
+    """
+
+    def __init__(self, path: str, resolution: float = PDF_RESOLUTION):
+        self.scale = 72.0 / resolution
+        self.width = 0
+        self.height = 0
+        self._file = open(path, 'wb')
+        self._offsets = {}
+        self._strips = []  # (对象编号, 宽, 高, 顶部y)
+        self._next_obj = 3  # 1: Catalog, 2: Pages
+        self._file.write(b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n')
+
+    def _begin_object(self, num: int = None) -> int:
+        if num is None:
+            num = self._next_obj
+            self._next_obj += 1
+        self._offsets[num] = self._file.tell()
+        self._file.write(f'{num} 0 obj\n'.encode())
+        return num
+
+    def _write_stream(self, dictionary: str, data, num: int = None, length: int = None) -> int:
+        """写入一个流对象；data 可以是 bytes，也可以是已知总长度 length 的分块迭代器。"""
+        if isinstance(data, (bytes, bytearray)):
+            data, length = [data], len(data)
+        num = self._begin_object(num)
+        self._file.write(f'<< {dictionary} /Length {length} >>\nstream\n'.encode())
+        for chunk in data:
+            self._file.write(chunk)
+        self._file.write(b'\nendstream\nendobj\n')
+        return num
+
+    def add_strip(self, data, width: int, height: int,
+                  filter_name: str = 'FlateDecode', colorspace: str = 'DeviceRGB',
+                  decode_parms: str = None, length: int = None):
+        """
+        在页面底部追加一个已编码的图片条带。
+
+        data 为 bytes，或配合 length 传入分块迭代器（用于从文件直接拷贝编码数据）。
+        """
+        dictionary = (f'/Type /XObject /Subtype /Image /Width {width} /Height {height} '
+                      f'/ColorSpace /{colorspace} /BitsPerComponent 8 /Filter /{filter_name}')
+        if decode_parms:
+            dictionary += f' /DecodeParms {decode_parms}'
+        num = self._write_stream(dictionary, data, length=length)
+        self._strips.append((num, width, height, self.height))
+        self.width = max(self.width, width)
+        self.height += height
+
+    def add_rgb_rows(self, rgb: bytes, width: int, height: int):
+        """追加一个原始RGB像素条带（Flate压缩后写入）。"""
+        self.add_strip(zlib.compress(rgb, 6), width, height)
+
+    def add_image(self, image, jpeg_quality: int = None):
+        """追加一个PIL RGB图像条带；指定 jpeg_quality 时以JPEG（DCTDecode）嵌入。"""
+        if jpeg_quality is None:
+            self.add_rgb_rows(image.tobytes(), image.width, image.height)
+        else:
+            self.add_strip(_encode_jpeg(image, jpeg_quality), image.width, image.height,
+                           filter_name='DCTDecode')
+
+    def close(self):
+        s = self.scale
+        ops = []
+        xobjects = []
+        for i, (num, width, height, top) in enumerate(self._strips):
+            bottom = self.height - top - height
+            ops.append(f'q {width * s:.4f} 0 0 {height * s:.4f} 0 {bottom * s:.4f} cm '
+                       f'/Im{i} Do Q')
+            xobjects.append(f'/Im{i} {num} 0 R')
+        content = self._write_stream('', '\n'.join(ops).encode())
+
+        page = self._begin_object()
+        self._file.write(
+            (f'<< /Type /Page /Parent 2 0 R '
+             f'/MediaBox [0 0 {self.width * s:.4f} {self.height * s:.4f}] '
+             f'/Resources << /XObject << {" ".join(xobjects)} >> >> '
+             f'/Contents {content} 0 R >>\nendobj\n').encode())
+
+        self._begin_object(1)
+        self._file.write(b'<< /Type /Catalog /Pages 2 0 R >>\nendobj\n')
+        self._begin_object(2)
+        self._file.write(f'<< /Type /Pages /Kids [{page} 0 R] /Count 1 >>\nendobj\n'.encode())
+
+        xref_offset = self._file.tell()
+        count = self._next_obj
+        self._file.write(f'xref\n0 {count}\n0000000000 65535 f \n'.encode())
+        for num in range(1, count):
+            self._file.write(f'{self._offsets[num]:010d} 00000 n \n'.encode())
+        self._file.write(
+            (f'trailer\n<< /Size {count} /Root 1 0 R >>\n'
+             f'startxref\n{xref_offset}\n%%EOF\n').encode())
+        self._file.close()
+
+
+# PNG颜色类型 -> (PDF色彩空间, 每像素分量数)，仅这些类型可以直通嵌入
+PNG_PASSTHROUGH_COLORS = {0: ('DeviceGray', 1), 2: ('DeviceRGB', 3)}
+JPEG_COLORSPACES = {1: 'DeviceGray', 3: 'DeviceRGB'}
+
+
+def _read_png_layout(path: str):
+    """
+    读取PNG的 IHDR 及所有 IDAT 块位置（不解码像素）。
+
+    Returns:
+        (ihdr字典, [(偏移, 长度), ...])；不是PNG时返回 None
+    """
+    with open(path, 'rb') as f:
+        if f.read(8) != b'\x89PNG\r\n\x1a\n':
+            return None
+        ihdr = None
+        idat = []
+        while True:
+            header = f.read(8)
+            if len(header) < 8:
+                break
+            length = int.from_bytes(header[:4], 'big')
+            chunk_type = header[4:]
+            if chunk_type == b'IHDR':
+                data = f.read(length)
+                f.seek(4, os.SEEK_CUR)
+                ihdr = {
+                    'width': int.from_bytes(data[0:4], 'big'),
+                    'height': int.from_bytes(data[4:8], 'big'),
+                    'bit_depth': data[8],
+                    'color_type': data[9],
+                    'interlace': data[12],
+                }
+                continue
+            if chunk_type == b'IDAT':
+                idat.append((f.tell(), length))
+            elif chunk_type == b'IEND':
+                break
+            f.seek(length + 4, os.SEEK_CUR)
+    return ihdr, idat
+
+
+def _read_jpeg_layout(path: str):
+    """读取JPEG的宽、高和分量数（扫描SOF标记），不是JPEG或文件截断/损坏时返回 None。"""
+    with open(path, 'rb') as f:
+        if f.read(2) != b'\xff\xd8':
+            return None
+        while True:
+            marker = f.read(2)
+            if len(marker) < 2 or marker[0] != 0xFF:
+                return None
+            code = marker[1]
+            if code in (0xD8, 0x01) or 0xD0 <= code <= 0xD7:
+                continue
+            length_bytes = f.read(2)
+            length = int.from_bytes(length_bytes, 'big')
+            # 截断或损坏的段：交给 Pillow 处理，避免原地反复 seek
+            if len(length_bytes) < 2 or length < 2:
+                return None
+            # SOF0-SOF15，排除 DHT(C4)、JPG(C8)、DAC(CC)
+            if 0xC0 <= code <= 0xCF and code not in (0xC4, 0xC8, 0xCC):
+                data = f.read(length - 2)
+                if len(data) < 6:
+                    return None
+                return {
+                    'height': int.from_bytes(data[1:3], 'big'),
+                    'width': int.from_bytes(data[3:5], 'big'),
+                    'components': data[5],
+                }
+            f.seek(length - 2, os.SEEK_CUR)
+
+
+def _iter_file_ranges(path: str, ranges, chunk_size: int = 1 << 20):
+    """按固定大小的缓冲区依次读出文件中的若干 (偏移, 长度) 区间。"""
+    with open(path, 'rb') as f:
+        for offset, length in ranges:
+            f.seek(offset)
+            while length > 0:
+                chunk = f.read(min(chunk_size, length))
+                if not chunk:
+                    raise ValueError(f"图片文件被截断: {path}")
+                length -= len(chunk)
+                yield chunk
+
+
+def _embed_passthrough(image_path: str, pdf: 'StreamingPDFWriter') -> bool:
+    """
+    不解码像素，直接把PNG的压缩数据或JPEG数据作为PDF图像流嵌入。
+
+    PNG 的 IDAT 数据就是带行过滤的 zlib 流，等价于 PDF 的 FlateDecode
+    加 PNG 预测器（/Predictor 15），因此 8 位灰度/RGB、非隔行的 PNG 可以原样拷贝；
+    JPEG 以 DCTDecode 原样嵌入。其余情况返回 False。
+    """
+    png = _read_png_layout(image_path)
+    if png is not None:
+        ihdr, idat = png
+        color = PNG_PASSTHROUGH_COLORS.get(ihdr['color_type']) if ihdr else None
+        if color is None or ihdr['bit_depth'] != 8 or ihdr['interlace'] or not idat:
+            return False
+        colorspace, colors = color
+        pdf.add_strip(
+            _iter_file_ranges(image_path, idat), ihdr['width'], ihdr['height'],
+            colorspace=colorspace,
+            decode_parms=(f"<< /Predictor 15 /Colors {colors} /BitsPerComponent 8 "
+                          f"/Columns {ihdr['width']} >>"),
+            length=sum(length for _, length in idat),
+        )
+        return True
+
+    jpeg = _read_jpeg_layout(image_path)
+    if jpeg is not None and jpeg['components'] in JPEG_COLORSPACES:
+        size = os.path.getsize(image_path)
+        pdf.add_strip(
+            _iter_file_ranges(image_path, [(0, size)]), jpeg['width'], jpeg['height'],
+            filter_name='DCTDecode', colorspace=JPEG_COLORSPACES[jpeg['components']],
+            length=size,
+        )
+        return True
+
+    return False
+
+
+def _encode_jpeg(image, quality: int) -> bytes:
+    """把PIL图像编码为JPEG字节。"""
+    import io
+
+    buffer = io.BytesIO()
+    image.save(buffer, 'JPEG', quality=quality, optimize=True)
+    return buffer.getvalue()
+
+
+def _pdf_jpeg_quality(options: RenderOptions):
+    """PDF内以JPEG嵌入时的质量；使用无损编码时返回 None。"""
+    return options.image_quality if options.pdf_image == 'jpeg' else None
+
+
+class TiledOutput:
+    """
+    接收逐条截取的PNG条带，流式写出长图PNG（以及可选的PDF）。
+
+    同步和异步截图流程共用此类，只有截图调用本身不同。
+    """
+
+    def __init__(self, output_path: str, pdf_path: str = None, options: RenderOptions = None):
+        options = options or RenderOptions()
+        if options.image_format not in ('png', 'png-optimized'):
+            raise ValueError(f"平铺截图只支持PNG长图，不支持: {options.image_format}")
+        self.output_path = output_path
+        self._compress_level = 9 if options.image_format == 'png-optimized' else 6
+        self._jpeg_quality = _pdf_jpeg_quality(options)
+        self._image_module = _import_pil_image()
+        self._png = None
+        self._pdf = StreamingPDFWriter(pdf_path) if pdf_path else None
+
+    def add(self, data: bytes):
+        """追加一个条带截图（PNG字节）。"""
+        import io
+
+        with self._image_module.open(io.BytesIO(data)) as strip:
+            rgb_strip = strip.convert('RGB')
+        if self._png is None:
+            self._png = StreamingPNGWriter(self.output_path, rgb_strip.width,
+                                           self._compress_level)
+        self._png.write_rows(rgb_strip.tobytes(), rgb_strip.height)
+        if self._pdf is not None:
+            self._pdf.add_image(rgb_strip, self._jpeg_quality)
+
+    def close(self):
+        if self._png is not None:
+            self._png.close()
+        if self._pdf is not None:
+            self._pdf.close()
+
+
+def _tile_clips(width: int, height: int, tile_height: int):
+    """生成覆盖整页的条带截图区域。"""
+    for top in range(0, height, tile_height):
+        yield {'x': 0, 'y': top, 'width': width, 'height': min(tile_height, height - top)}
+
+
+def _capture_tiled(page, output_path: str, tile_height: int, pdf_path: str = None,
+                   options: RenderOptions = None):
+    """
+    按条带截取整页并流式写出PNG（以及可选的PDF），不在内存中保留整张位图。
+    """
+    tiles = TiledOutput(output_path, pdf_path, options)
+    try:
+        width, height = page.evaluate(PAGE_SIZE_JS)
+        for clip in _tile_clips(width, height, tile_height):
+            tiles.add(page.screenshot(clip=clip, full_page=True))
+    finally:
+        tiles.close()
+
+
+def _encode_screenshot(data: bytes, output_path: str, options: RenderOptions):
+    """把整页PNG截图按 image_format 重新编码（png-optimized、webp）。"""
+    import io
+
+    Image = _import_pil_image()
+    with Image.open(io.BytesIO(data)) as image:
+        if options.image_format == 'png-optimized':
+            image.save(output_path, 'PNG', optimize=True)
+        elif options.image_format == 'webp':
+            if max(image.size) > WEBP_MAX_DIMENSION:
+                raise ValueError(f"页面尺寸 {image.width}x{image.height} 超出WebP上限 "
+                                 f"{WEBP_MAX_DIMENSION}px，请改用PNG或JPEG")
+            lossless = options.image_quality >= 100
+            image.save(output_path, 'WEBP', quality=options.image_quality,
+                       lossless=lossless, method=4)
+        else:
+            raise ValueError(f"不支持的图片格式: {options.image_format}")
+
+
+def _full_screenshot_kwargs(output_path: str, options: RenderOptions) -> dict:
+    """
+    整页截图参数：png/jpeg 由Chromium直接写文件（参数含 path），
+    其余格式需要先取得PNG字节再重新编码（参数不含 path）。
+    """
+    if options.image_format == 'png':
+        return {'path': output_path, 'full_page': True}
+    if options.image_format == 'jpeg':
+        # 由Chromium直接编码JPEG，省去一次PNG编解码
+        return {'path': output_path, 'full_page': True, 'type': 'jpeg',
+                'quality': options.image_quality}
+    return {'full_page': True}
+
+
+def _capture_full(page, output_path: str, options: RenderOptions):
+    """整页一次截图，并按 image_format 编码输出。"""
+    kwargs = _full_screenshot_kwargs(output_path, options)
+    data = page.screenshot(**kwargs)
+    if 'path' not in kwargs:
+        _encode_screenshot(data, output_path, options)
+
+
+def _vector_pdf_kwargs(pdf_path: str, width: int, height: int) -> dict:
+    """单页矢量PDF的打印参数，页面尺寸等于实测的页面宽高。"""
+    return {
+        'path': pdf_path,
+        'width': f'{width}px',
+        # 多留1px避免取整误差导致溢出到第二页
+        'height': f'{height + 1}px',
+        'margin': {'top': '0', 'right': '0', 'bottom': '0', 'left': '0'},
+        'print_background': True,
+        'page_ranges': '1',
+    }
+
+
+def _print_vector_pdf(page, pdf_path: str):
+    """用Chromium原生打印将整页输出为一页矢量PDF。"""
+    page.emulate_media(media='screen')
+    try:
+        width, height = page.evaluate(PAGE_SIZE_JS)
+        page.pdf(**_vector_pdf_kwargs(pdf_path, width, height))
+    finally:
+        page.emulate_media(media='null')
+
+
+def _default_output_path(html_path: str, output_dir: str = None, suffix: str = '.png') -> str:
+    """根据HTML路径生成默认的长图输出路径。"""
+    html_file = Path(html_path)
+    parent = Path(output_dir) if output_dir else html_file.parent
+    return str(parent / f"{html_file.stem}_fullpage{suffix}")
+
+
+def _wait_for_network_quiet(page, pending: set, deadline: float, quiet: float) -> bool:
+    """等待进行中的请求清空并保持 quiet 秒，超过 deadline 返回 False。"""
+    quiet_since = None
+    while True:
+        now = time.monotonic()
+        if pending:
+            quiet_since = None
+        elif quiet_since is None:
+            quiet_since = now
+        elif now - quiet_since >= quiet:
+            return True
+        if now >= deadline:
+            return False
+        page.wait_for_timeout(10)
 
+
+def _wait_for_content(page, pending: set, options: RenderOptions) -> bool:
+    """
+    基于事件等待懒加载内容就绪，替代固定时长的 sleep。
+
+    逐屏滚动触发 IntersectionObserver，随后等待字体、图片加载完成以及网络请求
+    清空；若页面高度因新内容而增长则再滚动一轮。所有等待共享 load_timeout 上限。
+
+    Returns:
+        在上限内全部就绪时返回 True，超时返回 False
+    """
+    deadline = time.monotonic() + options.load_timeout
+    height = None
+    while True:
+        remaining_ms = max(0, int((deadline - time.monotonic()) * 1000))
+        new_height = page.evaluate(SCROLL_THROUGH_JS, remaining_ms)
+        remaining_ms = max(0, int((deadline - time.monotonic()) * 1000))
+        if not page.evaluate(WAIT_ASSETS_JS, remaining_ms):
+            return False
+        if not _wait_for_network_quiet(page, pending, deadline, options.network_quiet):
+            return False
+        if new_height == height:
+            return True
+        height = new_height
+        if time.monotonic() >= deadline:
+            return False
+
+
+def _render_page(page, html_path: str, output_path: str, options: RenderOptions = None,
+                 pdf_path: str = None, profile: RenderProfile = None) -> str:
+    """在已打开的页面上加载HTML并截取完整长图。"""
+    options = options or RenderOptions()
+    profile = profile or RenderProfile(html_path)
+
+    # 跟踪进行中的网络请求，用于判断懒加载是否完成
+    pending = set()
+    on_request = pending.add
+    on_finished = pending.discard
+    page.on('request', on_request)
+    page.on('requestfinished', on_finished)
+    page.on('requestfailed', on_finished)
+
+    # 按规则拦截、放行或用本地文件响应请求
+    rules = RequestRules.for_options(options)
+    if rules is not None:
+        page.route('**/*', rules.handle)
+    try:
+        return _capture_page(page, html_path, output_path, options, pending, pdf_path,
+                             profile)
+    finally:
+        page.remove_listener('request', on_request)
+        page.remove_listener('requestfinished', on_finished)
+        page.remove_listener('requestfailed', on_finished)
+        if rules is not None:
+            page.unroute('**/*', rules.handle)
+            rules.finish(profile)
+
+
+def _wait_for_ready(page, options: RenderOptions) -> bool:
+    """等待 ready_selector 出现、ready_function 返回真值；超时返回 False。"""
+    from playwright.sync_api import TimeoutError as PlaywrightTimeoutError
+
+    timeout_ms = options.load_timeout * 1000
+    try:
+        if options.ready_selector:
+            page.wait_for_selector(options.ready_selector, state='attached', timeout=timeout_ms)
+        if options.ready_function:
+            page.wait_for_function(options.ready_function, timeout=timeout_ms)
+    except PlaywrightTimeoutError:
+        return False
+    return True
+
+
+def _capture_page(page, html_path: str, output_path: str, options: RenderOptions,
+                  pending: set, pdf_path: str = None, profile: RenderProfile = None) -> str:
+    """加载HTML、等待内容就绪并截图（由 _render_page 负责网络请求跟踪）。"""
+    profile = profile or RenderProfile(html_path)
+
+    # 加载HTML
+    html_path_abs = str(Path(html_path).absolute())
+    print("⏳ 加载HTML...")
+    with profile.stage('goto'):
+        page.goto(f'file://{html_path_abs}', wait_until=options.wait_until)
+
+    # 禁用所有动画
+    print("🎨 禁用动画...")
+    with profile.stage('prepare'):
+        page.add_style_tag(content=DISABLE_ANIMATION_CSS)
+
+        # 强制显示所有内容
+        page.evaluate(FORCE_VISIBLE_JS)
+
+    # 滚动触发懒加载，并等待图片、字体与网络请求就绪
+    print("📜 加载所有内容...")
+    with profile.stage('load_content'):
+        settled = _wait_for_content(page, pending, options)
+    if not settled:
+        print(f"⚠️  内容加载超过 {options.load_timeout:g} 秒，继续截图")
+
+    if options.ready_selector or options.ready_function:
+        with profile.stage('ready'):
+            ready = _wait_for_ready(page, options)
+        if not ready:
+            print(f"⚠️  就绪条件在 {options.load_timeout:g} 秒内未满足，继续截图")
+
+    width, height = page.evaluate(PAGE_SIZE_JS)
+    profile.record(page_width=width, page_height=height, content_settled=settled)
+
+    # 截取完整页面
+    with profile.stage('capture'):
+        if options.pdf_mode == 'vector':
+            print("🖨️  打印为矢量PDF...")
+            _print_vector_pdf(page, output_path)
+        elif options.capture == 'tiled':
+            tile_height = options.tile_height or page.viewport_size['height']
+            print(f"📸 分条截取完整页面（每条 {tile_height}px）...")
+            _capture_tiled(page, output_path, tile_height, pdf_path, options)
+        else:
+            print("📸 截取完整页面...")
+            _capture_full(page, output_path, options)
+
+    peak_rss = _peak_rss_mb()
+    profile.record(peak_rss_mb=peak_rss, browser_rss_mb=_browser_rss_mb())
+    if peak_rss is not None:
+        print(f"   峰值内存(RSS): {peak_rss:.1f} MB")
+
+    return output_path
+
+
+class BrowserPool:
+    """
+    常驻Chromium浏览器池。
+
+    只启动一次浏览器，并保留最多 pool_size 个已打开的页面（每个页面独占一个
+    浏览器上下文）在多个文件之间复用。每个上下文渲染 recycle_after 次后重建，
+    避免长时间批量运行时内存持续增长。timeout（秒）作为页面内各项操作的默认超时。
+
+    用法:
+        with BrowserPool(pool_size=2) as pool:
+            pool.render("a.html")
+            pool.render("b.html")
+    """
+
+    def __init__(self, pool_size: int = 1, viewport: dict = None, recycle_after: int = 50,
+                 timeout: float = None):
+        if pool_size < 1:
+            raise ValueError(f"pool_size 必须 >= 1: {pool_size}")
+        self.pool_size = pool_size
+        self.viewport = dict(viewport or DEFAULT_VIEWPORT)
+        self.recycle_after = recycle_after
+        self.timeout = timeout
+        self._playwright_cm = None
+        self._playwright = None
+        self._browser = None
+        self._idle = []
+        self._in_use = 0
+        self._uses = {}
+
+    def start(self) -> "BrowserPool":
+        """启动Playwright与Chromium（重复调用无副作用）。"""
+        if self._browser is None:
+            sync_playwright = _import_sync_playwright()
+            self._playwright_cm = sync_playwright()
+            self._playwright = self._playwright_cm.__enter__()
+            self._browser = self._playwright.chromium.launch()
+        return self
+
+    def close(self):
+        """关闭所有页面、浏览器以及Playwright。"""
+        for page in self._idle:
+            self._discard(page)
+        self._idle = []
+        if self._browser is not None:
+            self._browser.close()
+            self._browser = None
+        if self._playwright_cm is not None:
+            self._playwright_cm.__exit__(None, None, None)
+            self._playwright_cm = None
+            self._playwright = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def _new_page(self):
+        context = self._browser.new_context(viewport=self.viewport)
+        if self.timeout is not None:
+            context.set_default_timeout(self.timeout * 1000)
+        page = context.new_page()
+        self._uses[id(page)] = 0
+        return page
+
+    def _discard(self, page):
+        self._uses.pop(id(page), None)
+        try:
+            page.context.close()
+        except Exception:
+            pass
+
+    def acquire(self):
+        """取出一个可用页面；没有空闲页面时新建（不超过 pool_size）。"""
+        self.start()
+        if self._idle:
+            page = self._idle.pop()
+        elif self._in_use < self.pool_size:
+            page = self._new_page()
+        else:
+            raise RuntimeError(f"浏览器池已满: {self.pool_size} 个页面均在使用中")
+        self._in_use += 1
+        return page
+
+    def release(self, page, broken: bool = False):
+        """归还页面；页面出错或达到复用上限时重建上下文。"""
+        self._in_use -= 1
+        uses = self._uses.get(id(page), 0) + 1
+        if broken or page.is_closed() or uses >= self.recycle_after:
+            self._discard(page)
+            return
+        self._uses[id(page)] = uses
+        self._idle.append(page)
+
+    def render(self, html_path: str, output_path: str = None,
+               options: RenderOptions = None, pdf_path: str = None,
+               profile: RenderProfile = None) -> str:
+        """使用池中的页面将一个HTML文件渲染为长图。"""
+        if not os.path.exists(html_path):
+            raise FileNotFoundError(f"HTML文件不存在: {html_path}")
+        if output_path is None:
+            output_path = _default_output_path(html_path)
+        profile = profile or RenderProfile(html_path)
+
+        if self._browser is None:
+            with profile.stage('browser_launch'):
+                self.start()
+        with profile.stage('acquire_page'):
+            page = self.acquire()
+        broken = False
+        try:
+            return _render_page(page, html_path, output_path, options, pdf_path, profile)
+        except Exception:
+            broken = True
+            raise
+        finally:
+            self.release(page, broken=broken)
+
+
+def _render_with_pool(pool: BrowserPool, html_path: str, output_path: str,
+                      options: RenderOptions, pdf_path: str = None,
+                      profile: RenderProfile = None):
+    """用给定的浏览器池渲染；未提供时临时启动一个（启动耗时计入 profile）。"""
+    if pool is not None:
+        pool.render(html_path, output_path, options, pdf_path, profile)
+        return
+    own_pool = BrowserPool(pool_size=1)
+    try:
+        own_pool.render(html_path, output_path, options, pdf_path, profile)
+    finally:
+        own_pool.close()
+
+
+def html_to_long_image(html_path: str, output_path: str = None, pool: BrowserPool = None,
+                       options: RenderOptions = None, pdf_path: str = None,
+                       profile: RenderProfile = None) -> str:
+    """
+    将HTML转换为一张完整的长图PNG。
+
+    Args:
+        html_path: HTML文件路径
+        output_path: 输出图片路径（可选）
+        pool: 已启动的浏览器池（可选，传入时复用其中的浏览器）
+        options: 渲染选项（可选）
+        pdf_path: 平铺截图时同步流式写出的PDF路径（可选，仅 capture='tiled' 时生效）
+        profile: 记录分阶段耗时与资源指标的 RenderProfile（可选）
+
+    Returns:
+        生成的图片路径
+    """
     if not os.path.exists(html_path):
         raise FileNotFoundError(f"HTML文件不存在: {html_path}")
 
     if output_path is None:
-        html_file = Path(html_path)
-        output_path = str(html_file.parent / f"{html_file.stem}_fullpage.png")
+        output_path = _default_output_path(html_path)
 
     print(f"\n📄 转换HTML为完整长图")
     print(f"   输入: {Path(html_path).name}")
     print(f"   输出: {Path(output_path).name}\n")
 
-    with sync_playwright() as p:
-        browser = p.chromium.launch()
-        page = browser.new_page(viewport={'width': 1200, 'height': 800})
-
-        # 加载HTML
-        html_path_abs = str(Path(html_path).absolute())
-        print("⏳ 加载HTML...")
-        page.goto(f'file://{html_path_abs}', wait_until='networkidle')
-
-        # 禁用所有动画
-        print("🎨 禁用动画...")
-        page.add_style_tag(content="""
-            *, *::before, *::after {
-                animation: none !important;
-                transition: none !important;
-            }
-            .section, .cover {
-                opacity: 1 !important;
-                transform: none !important;
-            }
-        """)
-
-        # 强制显示所有内容
-        page.evaluate("""
-            () => {
-                document.querySelectorAll('.section, .cover').forEach(el => {
-                    el.style.opacity = '1';
-                    el.style.transform = 'none';
-                });
-            }
-        """)
-
-        # 滚动加载
-        print("📜 加载所有内容...")
-        total_height = page.evaluate("document.body.scrollHeight")
-        for y in range(0, total_height, 1000):
-            page.evaluate(f"window.scrollTo(0, {y})")
-            time.sleep(0.1)
-
-        page.evaluate("window.scrollTo(0, 0)")
-        time.sleep(0.5)
-
-        # 截取完整页面
-        print("📸 截取完整页面...")
-        page.screenshot(path=output_path, full_page=True)
-
-        browser.close()
+    _render_with_pool(pool, html_path, output_path, options, pdf_path, profile)
 
     size_kb = os.path.getsize(output_path) / 1024
     print(f"\n✅ 成功生成长图！")
@@ -95,40 +1247,488 @@ def html_to_long_image(html_path: str, output_path: str = None) -> str:
     return str(output_path)
 
 
-def image_to_pdf(image_path: str, pdf_path: str = None) -> str:
+def html_to_vector_pdf(html_path: str, pdf_path: str = None, pool: BrowserPool = None,
+                       options: RenderOptions = None, profile: RenderProfile = None) -> str:
     """
-    将图片转换为PDF。
+    将HTML一次性打印为单页矢量PDF（不经过PNG中转）。
+
+    页面高度取实测的 scrollHeight，因此与长图一样没有分页断开，
+    但文字保持矢量、可搜索，文件也更小。
 
     Args:
-        image_path: 图片路径
+        html_path: HTML文件路径
         pdf_path: PDF输出路径（可选）
+        pool: 已启动的浏览器池（可选，传入时复用其中的浏览器）
+        options: 渲染选项（可选）
+        profile: 记录分阶段耗时与资源指标的 RenderProfile（可选）
 
     Returns:
         生成的PDF路径
     """
+    if not os.path.exists(html_path):
+        raise FileNotFoundError(f"HTML文件不存在: {html_path}")
+
+    if pdf_path is None:
+        pdf_path = _default_output_path(html_path, suffix='.pdf')
+    options = replace(options or RenderOptions(), pdf_mode='vector')
+
+    print(f"\n📄 转换HTML为单页矢量PDF")
+    print(f"   输入: {Path(html_path).name}")
+    print(f"   输出: {Path(pdf_path).name}\n")
+
+    _render_with_pool(pool, html_path, pdf_path, options, profile=profile)
+
+    size_kb = os.path.getsize(pdf_path) / 1024
+    print(f"\n✅ PDF生成成功！大小: {size_kb:.1f} KB\n")
+
+    return str(pdf_path)
+
+
+def expand_html_inputs(patterns) -> list:
+    """展开输入路径列表中的通配符（支持 ** 递归），去重并保持顺序。"""
+    paths = []
+    seen = set()
+    for pattern in patterns:
+        if glob.has_magic(pattern):
+            matches = sorted(glob.glob(pattern, recursive=True))
+        else:
+            matches = [pattern]
+        for path in matches:
+            key = os.path.abspath(path)
+            if key not in seen:
+                seen.add(key)
+                paths.append(path)
+    return paths
+
+
+# 渲染流程或输出格式变化时递增，使旧缓存失效
+RENDER_CACHE_VERSION = 1
+DEFAULT_CACHE_DIR = os.path.join(
+    os.environ.get('XDG_CACHE_HOME', os.path.expanduser('~/.cache')), 'html-to-pdf', 'renders')
+
+# HTML/CSS 中引用外部资源的写法：src="..."、href="..."、poster="..."、url(...)
+ASSET_REF_RE = re.compile(
+    r"""(?:\b(?:src|href|poster)\s*=\s*["']([^"']+)["'])|(?:url\(\s*["']?([^"')]+?)["']?\s*\))""",
+    re.IGNORECASE,
+)
+REMOTE_SCHEME_RE = re.compile(r'^(?:[a-z][a-z0-9+.-]*:|//|#)', re.IGNORECASE)
+
+
+def _local_asset_paths(path: str, depth: int = 1) -> list:
+    """找出HTML（及其引用的CSS，深度 depth）引用的本地文件，按路径排序返回。"""
+    from urllib.parse import unquote, urlparse
+
+    found = set()
+    pending = [(os.path.abspath(path), depth)]
+    while pending:
+        current, level = pending.pop()
+        try:
+            with open(current, 'r', encoding='utf-8', errors='ignore') as f:
+                text = f.read()
+        except OSError:
+            continue
+        base = os.path.dirname(current)
+        for match in ASSET_REF_RE.finditer(text):
+            ref = (match.group(1) or match.group(2)).strip()
+            if ref.lower().startswith('file://'):
+                candidate = unquote(urlparse(ref).path)
+            elif REMOTE_SCHEME_RE.match(ref):
+                continue
+            else:
+                candidate = os.path.join(base, unquote(ref.split('#')[0].split('?')[0]))
+            candidate = os.path.abspath(candidate)
+            if candidate in found or candidate == current or not os.path.isfile(candidate):
+                continue
+            found.add(candidate)
+            if level > 0 and candidate.lower().endswith('.css'):
+                pending.append((candidate, level - 1))
+    return sorted(found)
+
+
+def _hash_file(path: str, digest=None):
+    digest = digest or hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest
+
+
+class RenderCache:
+    """
+    以内容哈希为键的磁盘渲染缓存。
+
+    键由HTML内容、其引用的本地资源、视口、注入的CSS/JS和渲染选项共同决定；
+    输入不变时直接复制缓存中的PNG/PDF。总大小超过 max_bytes 时按最近使用时间
+    （文件 mtime，命中时刷新）淘汰最旧的条目。
+    """
+
+    def __init__(self, cache_dir: str = DEFAULT_CACHE_DIR, max_bytes: int = 1 << 30):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, html_path: str, options: RenderOptions, viewport: dict,
+            to_pdf: bool) -> str:
+        """计算一次渲染的缓存键。"""
+        digest = hashlib.sha256()
+        config = {
+            'version': RENDER_CACHE_VERSION,
+            'options': asdict(options),
+            'viewport': viewport,
+            'to_pdf': to_pdf,
+            'css': DISABLE_ANIMATION_CSS,
+            'js': FORCE_VISIBLE_JS,
+        }
+        digest.update(json.dumps(config, sort_keys=True).encode())
+        _hash_file(html_path, digest)
+        base = os.path.dirname(os.path.abspath(html_path))
+        for asset in _local_asset_paths(html_path):
+            digest.update(os.path.relpath(asset, base).encode())
+            digest.update(_hash_file(asset).digest())
+        return digest.hexdigest()
+
+    def _entry(self, key: str, suffix: str) -> str:
+        return os.path.join(self.cache_dir, key + suffix)
+
+    def fetch(self, key: str, targets: dict) -> bool:
+        """
+        命中时把缓存文件复制到 targets（后缀 -> 目标路径）并返回 True。
+        """
+        entries = {suffix: self._entry(key, suffix) for suffix in targets}
+        try:
+            for suffix, target in targets.items():
+                shutil.copyfile(entries[suffix], target)
+                os.utime(entries[suffix])
+        except OSError:
+            self.misses += 1
+            return False
+        self.hits += 1
+        return True
+
+    def store(self, key: str, files: dict):
+        """把生成的文件（后缀 -> 源路径）写入缓存，然后按大小淘汰。"""
+        os.makedirs(self.cache_dir, exist_ok=True)
+        for suffix, source in files.items():
+            entry = self._entry(key, suffix)
+            tmp = f"{entry}.{os.getpid()}.tmp"
+            shutil.copyfile(source, tmp)
+            os.replace(tmp, entry)
+        self.evict()
+
+    def evict(self):
+        """删除最久未使用的条目，直到缓存总大小不超过 max_bytes。"""
+        _evict_lru(self.cache_dir, self.max_bytes)
+
+
+def _size_report(image_path: str = None, pdf_path: str = None) -> dict:
+    """
+    统计输出文件大小以及相对于未压缩RGB位图的压缩情况，并打印一行报告。
+
+    Returns:
+        包含 image_bytes、pdf_bytes、pixels、bits_per_pixel 的字典
+    """
+    report = {'image_bytes': None, 'pdf_bytes': None, 'pixels': None, 'bits_per_pixel': None}
+    parts = []
+    if image_path:
+        report['image_bytes'] = os.path.getsize(image_path)
+        Image = _import_pil_image()
+        with Image.open(image_path) as image:  # 只读取文件头
+            width, height = image.size
+        report['pixels'] = width * height
+        report['bits_per_pixel'] = report['image_bytes'] * 8 / max(report['pixels'], 1)
+        raw_bytes = report['pixels'] * 3
+        parts.append(f"长图 {report['image_bytes'] / 1024:.1f} KB "
+                     f"({report['bits_per_pixel']:.2f} bpp，"
+                     f"原始位图的 {report['image_bytes'] / raw_bytes:.1%})")
+    if pdf_path:
+        report['pdf_bytes'] = os.path.getsize(pdf_path)
+        parts.append(f"PDF {report['pdf_bytes'] / 1024:.1f} KB")
+    if parts:
+        print(f"📦 输出大小: {'，'.join(parts)}")
+    return report
+
+
+def _convert_file(pool: BrowserPool, html_path: str, output_dir: str = None,
+                  to_pdf: bool = True, options: RenderOptions = None,
+                  cache: RenderCache = None, profile: RenderProfile = None) -> dict:
+    """
+    转换单个文件（出错时抛出异常），按需使用渲染缓存。
+
+    Returns:
+        包含 image、pdf、cache（'hit'、'miss' 或 None）以及输出大小统计的字典
+    """
+    options = options or RenderOptions()
+    profile = profile or RenderProfile(html_path)
+    vector = options.pdf_mode == 'vector'
+    outputs = {'image': None, 'pdf': None, 'cache': None}
+    if vector:
+        targets = {'.pdf': _default_output_path(html_path, output_dir, '.pdf')}
+    else:
+        suffix = IMAGE_FORMATS[options.image_format]
+        targets = {suffix: _default_output_path(html_path, output_dir, suffix)}
+        if to_pdf:
+            targets['.pdf'] = str(Path(targets[suffix]).with_suffix('.pdf'))
+
+    key = None
+    if cache is not None and os.path.exists(html_path):
+        viewport = pool.viewport if pool is not None else DEFAULT_VIEWPORT
+        with profile.stage('cache_lookup'):
+            key = cache.key(html_path, options, viewport, to_pdf)
+            hit = cache.fetch(key, targets)
+        if hit:
+            print(f"♻️  命中缓存: {html_path}")
+            outputs['image'] = None if vector else targets[suffix]
+            outputs['pdf'] = targets.get('.pdf')
+            outputs['cache'] = 'hit'
+            outputs.update(_size_report(outputs['image'], outputs['pdf']))
+            return outputs
+        outputs['cache'] = 'miss'
+
+    if vector:
+        outputs['pdf'] = html_to_vector_pdf(html_path, targets['.pdf'], pool=pool,
+                                            options=options, profile=profile)
+    else:
+        # 平铺模式在截图时直接流式写出PDF，避免再次读入整张长图
+        tiled_pdf = targets.get('.pdf') if options.capture == 'tiled' else None
+        outputs['image'] = html_to_long_image(html_path, targets[suffix], pool=pool,
+                                              options=options, pdf_path=tiled_pdf,
+                                              profile=profile)
+        if tiled_pdf:
+            outputs['pdf'] = tiled_pdf
+            print(f"✅ PDF生成成功！大小: {os.path.getsize(tiled_pdf) / 1024:.1f} KB\n")
+        elif to_pdf:
+            with profile.stage('image_to_pdf'):
+                outputs['pdf'] = image_to_pdf(outputs['image'], targets['.pdf'],
+                                              jpeg_quality=_pdf_jpeg_quality(options))
+
+    if key is not None:
+        with profile.stage('cache_store'):
+            cache.store(key, targets)
+    outputs.update(_size_report(outputs['image'], outputs['pdf']))
+    if outputs['pixels']:
+        # Chromium 内部以 RGBA 保存位图
+        profile.record(bitmap_pixels=outputs['pixels'],
+                       bitmap_mb=round(outputs['pixels'] * 4 / (1024 * 1024), 1))
+    return outputs
+
+
+def _convert_one(pool: BrowserPool, html_path: str, output_dir: str = None,
+                 to_pdf: bool = True, options: RenderOptions = None,
+                 cache: RenderCache = None) -> dict:
+    """用给定的浏览器池转换单个文件，返回结果字典（不抛出异常）。"""
+    result = {'input': html_path, 'image': None, 'pdf': None, 'cache': None,
+              'ok': False, 'error': None, 'seconds': 0.0, 'worker': None}
+    profile = RenderProfile(html_path)
+    start = time.perf_counter()
     try:
-        from PIL import Image
-    except ImportError:
-        print("正在安装 Pillow...")
-        import subprocess
-        subprocess.check_call([sys.executable, "-m", "pip", "install", "Pillow", "-q"])
-        from PIL import Image
+        result.update(_convert_file(pool, html_path, output_dir, to_pdf, options, cache,
+                                    profile))
+        result['ok'] = True
+    except Exception as e:
+        result['error'] = str(e)
+        print(f"❌ 错误: {e}\n")
+    result['seconds'] = time.perf_counter() - start
+    result['profile'] = profile.to_dict()
+    return result
+
+
+def _worker_main(worker_id: int, task_queue, result_queue, timeout: float = None,
+                 cache: RenderCache = None):
+    """工作进程：独占一个Chromium，从共享队列中领取任务直到收到 None。"""
+    pool = BrowserPool(timeout=timeout)
+    try:
+        while True:
+            task = task_queue.get()
+            if task is None:
+                break
+            index, html_path, output_dir, to_pdf, options = task
+            result_queue.put(('start', worker_id, index, None))
+            result = _convert_one(pool, html_path, output_dir, to_pdf, options, cache)
+            result['worker'] = worker_id
+            result_queue.put(('done', worker_id, index, result))
+    finally:
+        pool.close()
+
+
+def _run_parallel(paths: list, output_dir: str, to_pdf: bool, workers: int,
+                  timeout: float = None, options: RenderOptions = None,
+                  cache: RenderCache = None) -> list:
+    """
+    多进程并行转换。
+
+    所有任务放入一个共享队列，由 workers 个进程（各自持有一个Chromium）领取。
+    单个文件超过 timeout 秒时终止对应进程、记为失败，并启动新进程接替。
+    """
+    import multiprocessing
+    import queue
+
+    ctx = multiprocessing.get_context()
+    task_queue = ctx.Queue()
+    result_queue = ctx.Queue()
+    workers = max(1, min(workers, len(paths)))
+
+    for index, html_path in enumerate(paths):
+        task_queue.put((index, html_path, output_dir, to_pdf, options))
+    for _ in range(workers):
+        task_queue.put(None)
+
+    procs = {}
+    in_flight = {}  # worker_id -> (index, 开始时间)
+    next_worker_id = 0
+
+    def spawn():
+        nonlocal next_worker_id
+        worker_id = next_worker_id
+        next_worker_id += 1
+        proc = ctx.Process(
+            target=_worker_main,
+            args=(worker_id, task_queue, result_queue, timeout, cache),
+            daemon=True,
+        )
+        proc.start()
+        procs[worker_id] = proc
+
+    def fail(worker_id, error):
+        index, started = in_flight.pop(worker_id)
+        results[index] = {'input': paths[index], 'image': None, 'pdf': None,
+                          'cache': None, 'ok': False, 'error': error,
+                          'seconds': time.perf_counter() - started, 'worker': worker_id}
+        print(f"❌ [worker {worker_id}] {paths[index]}: {error}\n")
+
+    for _ in range(workers):
+        spawn()
+
+    results = [None] * len(paths)
+    remaining = len(paths)
+    while remaining:
+        idle = False
+        try:
+            kind, worker_id, index, result = result_queue.get(timeout=0.5)
+            if kind == 'start':
+                in_flight[worker_id] = (index, time.perf_counter())
+            elif results[index] is None:
+                in_flight.pop(worker_id, None)
+                results[index] = result
+                remaining -= 1
+                print(f"[{len(paths) - remaining}/{len(paths)}] "
+                      f"{'✅' if result['ok'] else '❌'} {paths[index]} "
+                      f"({result['seconds']:.2f}s, worker {worker_id})")
+        except queue.Empty:
+            idle = True
+
+        # 每轮都检查超时：其他进程持续产出结果时，卡住的进程也要按时终止
+        now = time.perf_counter()
+        for worker_id, proc in list(procs.items()):
+            if worker_id in in_flight:
+                started = in_flight[worker_id][1]
+                if timeout is not None and now - started > timeout:
+                    proc.terminate()
+                    proc.join()
+                    del procs[worker_id]
+                    fail(worker_id, f"超时（>{timeout:g} 秒）")
+                    remaining -= 1
+                    spawn()
+                    continue
+            # 进程退出前发出的消息可能还在队列中，队列取空后再判断异常退出
+            if idle and not proc.is_alive():
+                del procs[worker_id]
+                if worker_id in in_flight:
+                    fail(worker_id, f"工作进程异常退出（exitcode={proc.exitcode}）")
+                    remaining -= 1
+                    spawn()
+                elif not procs and remaining:
+                    # 所有进程都已退出但仍有未完成的任务，补一个进程继续消费队列
+                    spawn()
+
+    for proc in procs.values():
+        proc.join(timeout=5)
+        if proc.is_alive():
+            proc.terminate()
+
+    return results
 
+
+def html_to_long_images(html_paths, output_dir: str = None, to_pdf: bool = True,
+                        workers: int = 1, timeout: float = None,
+                        options: RenderOptions = None, cache: RenderCache = None) -> list:
+    """
+    批量将多个HTML转换为长图，每个进程只启动一次浏览器。
+
+    Args:
+        html_paths: HTML文件路径列表（可包含通配符）
+        output_dir: 输出目录（可选，默认与各HTML同目录）
+        to_pdf: 是否同时将长图转换为PDF
+        workers: 并行工作进程数，每个进程独占一个Chromium（默认: 1，即串行）
+        timeout: 单个文件的超时时间（秒，可选）
+        options: 渲染选项（可选）
+        cache: 渲染缓存（可选），输入未变化时直接复用之前的输出
+
+    Returns:
+        每个文件的结果字典列表，包含 input、image、pdf、cache、ok、error、seconds、worker
+    """
+    paths = expand_html_inputs(html_paths)
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+
+    if workers > 1 and len(paths) > 1:
+        return _run_parallel(paths, output_dir, to_pdf, workers, timeout,
+                             options, cache)
+
+    results = []
+    # 串行转换每次只占用一个页面，渲染完归还后由下一个文件复用
+    with BrowserPool(timeout=timeout) as pool:
+        for index, html_path in enumerate(paths, 1):
+            print(f"[{index}/{len(paths)}] {html_path}")
+            results.append(_convert_one(pool, html_path, output_dir, to_pdf, options, cache))
+
+    return results
+
+
+def image_to_pdf(image_path: str, pdf_path: str = None, strip_height: int = 1024,
+                 jpeg_quality: int = None) -> str:
+    """
+    将图片转换为单页PDF。
+
+    8 位灰度/RGB PNG 和 JPEG 直接把压缩数据拷贝进PDF，内存占用为固定大小的缓冲；
+    其他格式（如带透明通道、WebP）解码后按条带写入。
+
+    Args:
+        image_path: 图片路径
+        pdf_path: PDF输出路径（可选）
+        strip_height: 需要解码时每个条带的高度（像素）
+        jpeg_quality: 以JPEG嵌入时的质量（可选）；JPEG输入始终原样嵌入，
+            其他输入指定后按条带重新编码为JPEG，体积更小但有损
+
+    Returns:
+        生成的PDF路径
+    """
     if pdf_path is None:
         image_file = Path(image_path)
         pdf_path = str(image_file.with_suffix('.pdf'))
 
     print(f"📄 转换图片为PDF: {Path(pdf_path).name}")
 
-    # 打开图片并转换为PDF
-    image = Image.open(image_path)
-
-    # 转换为RGB（PDF需要）
-    if image.mode != 'RGB':
-        image = image.convert('RGB')
-
-    # 保存为PDF
-    image.save(pdf_path, 'PDF', resolution=100.0)
+    pdf = StreamingPDFWriter(pdf_path)
+    try:
+        # 优先直通嵌入压缩数据，只需固定大小的读缓冲
+        passthrough = _read_jpeg_layout(image_path) is not None or jpeg_quality is None
+        if passthrough and _embed_passthrough(image_path, pdf):
+            print("   直通嵌入图片数据（无需解码）")
+        else:
+            # 含透明通道、调色板等格式需要解码；按条带转换为RGB，
+            # 避免再生成一份整图大小的RGB副本
+            Image = _import_pil_image()
+            with Image.open(image_path) as image:
+                width, height = image.size
+                for top in range(0, height, strip_height):
+                    box = (0, top, width, min(top + strip_height, height))
+                    strip = image.crop(box)
+                    if strip.mode != 'RGB':
+                        strip = strip.convert('RGB')
+                    pdf.add_image(strip, jpeg_quality)
+    finally:
+        pdf.close()
 
     size_kb = os.path.getsize(pdf_path) / 1024
     print(f"✅ PDF生成成功！大小: {size_kb:.1f} KB\n")
@@ -136,24 +1736,306 @@ def image_to_pdf(image_path: str, pdf_path: str = None) -> str:
     return str(pdf_path)
 
 
+def print_batch_summary(results: list, wall_seconds: float = None):
+    """打印批量转换的汇总结果。"""
+    ok = [r for r in results if r['ok']]
+    failed = [r for r in results if not r['ok']]
+    total_seconds = sum(r['seconds'] for r in results)
+
+    print("=" * 70)
+    print(f"批量转换完成: 成功 {len(ok)} / 共 {len(results)}")
+    if results:
+        print(f"   平均每个文件: {total_seconds / len(results):.2f} 秒")
+    if wall_seconds:
+        print(f"   总耗时: {wall_seconds:.2f} 秒"
+              f"（吞吐: {len(results) / wall_seconds:.2f} 个/秒）")
+    image_bytes = sum(r.get('image_bytes') or 0 for r in results)
+    pdf_bytes = sum(r.get('pdf_bytes') or 0 for r in results)
+    if image_bytes or pdf_bytes:
+        print(f"   输出总大小: 长图 {image_bytes / 1024 / 1024:.1f} MB，"
+              f"PDF {pdf_bytes / 1024 / 1024:.1f} MB")
+    cached = [r['cache'] for r in results if r.get('cache')]
+    if cached:
+        print(f"   缓存: 命中 {cached.count('hit')}，未命中 {cached.count('miss')}")
+    workers = sorted({r['worker'] for r in results if r.get('worker') is not None})
+    if len(workers) > 1:
+        print(f"   工作进程: {len(workers)} 个")
+    for r in failed:
+        print(f"   ❌ {r['input']}: {r['error']}")
+    print("=" * 70 + "\n")
+
+
+def _percentile(values: list, fraction: float):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+def print_profile_report(profiles: list):
+    """打印分阶段耗时（均值/p50/p95/最大值）及每个文件的资源指标。"""
+    stages = []
+    for profile in profiles:
+        stages.extend(name for name in profile['stages'] if name not in stages)
+
+    print("⏱️  分阶段耗时（秒）:")
+    print(f"   {'stage':<16}{'mean':>9}{'p50':>9}{'p95':>9}{'max':>9}")
+    for name in stages + ['wall_seconds']:
+        values = [p['wall_seconds'] if name == 'wall_seconds' else p['stages'][name]
+                  for p in profiles if name == 'wall_seconds' or name in p['stages']]
+        print(f"   {name:<16}{sum(values) / len(values):>9.3f}{_percentile(values, 0.5):>9.3f}"
+              f"{_percentile(values, 0.95):>9.3f}{max(values):>9.3f}")
+
+    print("📊 每个文件:")
+    for p in profiles:
+        size = (f"{p['page_width']}x{p['page_height']}px"
+                if 'page_height' in p else "尺寸未知")
+        bitmap = f"，位图 {p['bitmap_mb']} MB" if 'bitmap_mb' in p else ""
+        rss = f"，峰值RSS {p['peak_rss_mb']:.1f} MB" if 'peak_rss_mb' in p else ""
+        print(f"   {p['input']}: {p['wall_seconds']:.2f} 秒，{size}{bitmap}{rss}")
+    print()
+
+
+def write_metrics_jsonl(profiles: list, metrics_path: str):
+    """将每个文件的分阶段耗时与资源指标以JSON Lines追加写入文件。"""
+    with open(metrics_path, 'a', encoding='utf-8') as f:
+        for profile in profiles:
+            f.write(json.dumps(profile, ensure_ascii=False) + '\n')
+    print(f"📝 指标已追加到: {metrics_path}\n")
+
+
+def write_batch_report(results: list, report_path: str, wall_seconds: float = None):
+    """将批量转换结果写入JSON报告。"""
+    report = {
+        'total': len(results),
+        'succeeded': sum(1 for r in results if r['ok']),
+        'failed': sum(1 for r in results if not r['ok']),
+        'wall_seconds': wall_seconds,
+        'results': results,
+    }
+    with open(report_path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"📝 报告已写入: {report_path}\n")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description='将HTML渲染为完整长图（PNG）并转换为单页PDF'
+    )
+    parser.add_argument(
+        'inputs',
+        nargs='*',
+        default=["202510_Alpha_Intelligence_BP.html"],
+        help='HTML文件路径，可传多个或使用通配符（如 "reports/**/*.html"）'
+    )
+    parser.add_argument('--output-dir', help='输出目录（默认与HTML同目录）')
+    parser.add_argument(
+        '--workers',
+        type=int,
+        default=1,
+        help='并行工作进程数，每个进程独占一个Chromium（默认: 1）'
+    )
+    parser.add_argument('--timeout', type=float, help='单个文件的超时时间（秒）')
+    parser.add_argument('--report', help='将批量转换结果写入JSON报告文件')
+    parser.add_argument(
+        '--profile',
+        action='store_true',
+        help='打印分阶段耗时（浏览器启动、加载、懒加载、截图等）与资源指标'
+    )
+    parser.add_argument(
+        '--metrics-jsonl',
+        metavar='PATH',
+        help='将每个文件的分阶段耗时与资源指标以JSON Lines追加写入PATH'
+    )
+    parser.add_argument(
+        '--load-timeout',
+        type=float,
+        default=RenderOptions.load_timeout,
+        help='等待懒加载图片、字体和网络请求的最长时间（秒，默认: %(default)s）'
+    )
+    parser.add_argument(
+        '--capture',
+        choices=['full', 'tiled'],
+        default='full',
+        help='截图方式：full 整页一次截取；tiled 按条带截取并流式写出PNG/PDF，'
+             '适合超长页面（默认: full）'
+    )
+    parser.add_argument('--tile-height', type=int, help='平铺截图的条带高度（像素，默认为视口高度）')
+    parser.add_argument(
+        '--wait-until',
+        choices=WAIT_UNTIL_CHOICES,
+        default=RenderOptions.wait_until,
+        help='页面加载的就绪条件；networkidle 需要500ms无网络请求，'
+             '引用远程资源的页面可改用 load（默认: %(default)s）'
+    )
+    parser.add_argument('--ready-selector', help='截图前等待出现的CSS选择器')
+    parser.add_argument('--ready-function', help='截图前等待返回真值的JS表达式，如 "window.chartsReady"')
+    parser.add_argument(
+        '--offline',
+        action='store_true',
+        help='立即拒绝所有远程请求（--allow 指定的除外），离线环境下不等待超时'
+    )
+    parser.add_argument(
+        '--block',
+        action='append',
+        metavar='PATTERN',
+        help='拦截匹配的请求，可多次指定；主机名匹配其子域名，其余按URL通配符匹配'
+    )
+    parser.add_argument('--allow', action='append', metavar='PATTERN',
+                        help='--offline 时仍放行的远程请求规则，可多次指定')
+    parser.add_argument('--block-trackers', action='store_true',
+                        help='拦截常见统计分析与追踪服务（Google Analytics、百度统计等）')
+    parser.add_argument('--font-dir', help='本地字体目录，远程字体请求按文件名从此目录返回')
+    parser.add_argument('--asset-cache', action='store_true',
+                        help='把远程字体、CSS、JS等资源缓存到磁盘，之后的渲染直接复用')
+    parser.add_argument(
+        '--asset-cache-dir',
+        help=f'资源缓存目录（指定后自动启用资源缓存，默认: {DEFAULT_ASSET_CACHE_DIR}）'
+    )
+    parser.add_argument(
+        '--asset-ttl',
+        type=float,
+        default=RenderOptions.asset_ttl / 3600,
+        help='资源缓存有效期（小时，默认: %(default)s）；--offline 时忽略有效期'
+    )
+    parser.add_argument('--asset-cache-max-mb', type=float, default=RenderOptions.asset_cache_mb,
+                        help='资源缓存最大占用（MB，默认: %(default)s）')
+    parser.add_argument(
+        '--pdf-mode',
+        choices=['raster', 'vector'],
+        default='raster',
+        help='raster: 先生成长图再转PDF；vector: Chromium直接打印单页矢量PDF，'
+             '文字可搜索、文件更小，不生成PNG（默认: raster）'
+    )
+    parser.add_argument(
+        '--image-format',
+        choices=sorted(IMAGE_FORMATS),
+        default='png',
+        help='长图格式：png、png-optimized（无损最优压缩）、jpeg、webp（默认: png）'
+    )
+    parser.add_argument(
+        '--image-quality',
+        type=int,
+        default=RenderOptions.image_quality,
+        help='JPEG/WebP 质量 1-100，WebP 取 100 为无损（默认: %(default)s）'
+    )
+    parser.add_argument(
+        '--pdf-image',
+        choices=['flate', 'jpeg'],
+        default='flate',
+        help='PDF内图片编码：flate 无损；jpeg 以DCT嵌入，长图为JPEG时直接复用（默认: flate）'
+    )
+    parser.add_argument(
+        '--server',
+        nargs='?',
+        const='',
+        metavar='ADDRESS',
+        help='作为客户端把任务提交给运行中的 render_server.py'
+             '（可指定Unix套接字路径或 host:port，省略则使用默认地址）'
+    )
+    parser.add_argument('--cache', action='store_true', help='启用内容哈希渲染缓存')
+    parser.add_argument(
+        '--cache-dir',
+        help=f'渲染缓存目录（指定后自动启用缓存，默认: {DEFAULT_CACHE_DIR}）'
+    )
+    parser.add_argument(
+        '--cache-max-mb',
+        type=float,
+        default=1024,
+        help='渲染缓存最大占用，超出后按最近使用时间淘汰（MB，默认: %(default)s）'
+    )
+    args = parser.parse_args(argv)
+
+    if args.server is not None:
+        # 渲染在服务进程中完成：并发由服务端 --pool-size 决定，也不做缓存和分阶段计时
+        unsupported = [flag for flag, used in (('--workers', args.workers != 1),
+                                               ('--cache', args.cache or args.cache_dir),
+                                               ('--profile', args.profile),
+                                               ('--metrics-jsonl', args.metrics_jsonl))
+                       if used]
+        if unsupported:
+            parser.error(f"--server 模式不支持 {', '.join(unsupported)}")
+    return args
+
+
 def main():
-    default_html = "202510_Alpha_Intelligence_BP.html"
-    html_path = sys.argv[1] if len(sys.argv) > 1 else default_html
+    args = parse_args()
+    html_paths = expand_html_inputs(args.inputs)
+    options = RenderOptions(load_timeout=args.load_timeout, capture=args.capture,
+                            tile_height=args.tile_height, pdf_mode=args.pdf_mode,
+                            image_format=args.image_format,
+                            image_quality=args.image_quality, pdf_image=args.pdf_image,
+                            wait_until=args.wait_until, ready_selector=args.ready_selector,
+                            ready_function=args.ready_function,
+                            network='offline' if args.offline else 'allow',
+                            block=tuple(args.block or ()), allow=tuple(args.allow or ()),
+                            block_trackers=args.block_trackers, font_dir=args.font_dir,
+                            asset_cache=(args.asset_cache_dir or DEFAULT_ASSET_CACHE_DIR
+                                         if args.asset_cache or args.asset_cache_dir else None),
+                            asset_ttl=args.asset_ttl * 3600,
+                            asset_cache_mb=args.asset_cache_max_mb)
+
+    cache = None
+    if args.cache or args.cache_dir:
+        cache = RenderCache(args.cache_dir or DEFAULT_CACHE_DIR,
+                            int(args.cache_max_mb * 1024 * 1024))
 
     print("\n" + "=" * 70)
     print("HTML转完整长图工具 - 无分页断开")
     print("=" * 70)
 
+    if args.server is not None:
+        # 瘦客户端：由常驻服务的预热浏览器完成渲染
+        from render_server import submit
+
+        start = time.perf_counter()
+        try:
+            results = submit(html_paths, args.output_dir, options=options,
+                             address=args.server or None, render_timeout=args.timeout)
+        except (OSError, RuntimeError) as e:
+            print(f"❌ 渲染服务请求失败: {e}\n")
+            sys.exit(1)
+        for r in results:
+            outputs = ', '.join(p for p in (r['image'], r['pdf']) if p)
+            print(f"{'✅' if r['ok'] else '❌'} {r['input']}: {outputs or r['error']}")
+        wall_seconds = time.perf_counter() - start
+        print_batch_summary(results, wall_seconds)
+        if args.report:
+            write_batch_report(results, args.report, wall_seconds)
+        sys.exit(0 if all(r['ok'] for r in results) else 1)
+
+    if len(html_paths) > 1:
+        start = time.perf_counter()
+        results = html_to_long_images(html_paths, args.output_dir, workers=args.workers,
+                                      timeout=args.timeout, options=options, cache=cache)
+        wall_seconds = time.perf_counter() - start
+        print_batch_summary(results, wall_seconds)
+        profiles = [r['profile'] for r in results if r.get('profile')]
+        if args.profile and profiles:
+            print_profile_report(profiles)
+        if args.metrics_jsonl:
+            write_metrics_jsonl(profiles, args.metrics_jsonl)
+        if args.report:
+            write_batch_report(results, args.report, wall_seconds)
+        sys.exit(0 if all(r['ok'] for r in results) else 1)
+
     try:
-        # 生成长图
-        image_path = html_to_long_image(html_path)
+        html_path = html_paths[0] if html_paths else args.inputs[0]
+        if args.output_dir:
+            os.makedirs(args.output_dir, exist_ok=True)
 
-        # 转换为PDF
-        pdf_path = image_to_pdf(image_path)
+        profile = RenderProfile(html_path)
+        outputs = _convert_file(None, html_path, args.output_dir, True, options, cache,
+                                profile)
+        if args.profile:
+            print_profile_report([profile.to_dict()])
+        if args.metrics_jsonl:
+            write_metrics_jsonl([profile.to_dict()], args.metrics_jsonl)
 
         print(f"💡 打开查看:")
-        print(f"   长图: open {Path(image_path).name}")
-        print(f"   PDF:  open {Path(pdf_path).name}\n")
+        if outputs['image']:
+            print(f"   长图: open {Path(outputs['image']).name}")
+        print(f"   PDF:  open {Path(outputs['pdf']).name}\n")
 
     except Exception as e:
         print(f"\n❌ 错误: {e}\n")
@@ -0,0 +1,483 @@
+#!/usr/bin/env python3
+"""
+HTML转长图工具（异步版）
+基于 Playwright 异步 API，供 asyncio 服务在进程内并发渲染多个文档，
+无需 shell 调用脚本，也不会在线程池里阻塞等待 sync_playwright。
+
+用法:
+    async with AsyncBrowserPool(pool_size=4) as pool:
+        results = await asyncio.gather(
+            html_to_long_image_async("a.html", pool=pool),
+            html_to_long_image_async("b.html", pool=pool),
+        )
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+from dataclasses import replace
+from functools import partial
+from pathlib import Path
+
+from html_to_long_image import (
+    DEFAULT_VIEWPORT,
+    DISABLE_ANIMATION_CSS,
+    FORCE_VISIBLE_JS,
+    IMAGE_FORMATS,
+    PAGE_SIZE_JS,
+    SCROLL_THROUGH_JS,
+    WAIT_ASSETS_JS,
+    RenderOptions,
+    RequestRules,
+    TiledOutput,
+    _default_output_path,
+    _encode_screenshot,
+    _full_screenshot_kwargs,
+    _pdf_jpeg_quality,
+    _tile_clips,
+    _vector_pdf_kwargs,
+    expand_html_inputs,
+    image_to_pdf,
+    print_batch_summary,
+)
+
+
+def _import_async_playwright():
+    """导入Playwright异步API，缺失时自动安装。"""
+    try:
+        from playwright.async_api import async_playwright
+    except ImportError:
+        print("正在安装 Playwright...")
+        import subprocess
+        subprocess.check_call([sys.executable, "-m", "pip", "install", "playwright", "-q"])
+        from playwright.async_api import async_playwright
+    return async_playwright
+
+
+async def _wait_for_network_quiet(pending: set, deadline: float, quiet: float) -> bool:
+    """等待进行中的请求清空并保持 quiet 秒，超过 deadline 返回 False。"""
+    quiet_since = None
+    while True:
+        now = time.monotonic()
+        if pending:
+            quiet_since = None
+        elif quiet_since is None:
+            quiet_since = now
+        elif now - quiet_since >= quiet:
+            return True
+        if now >= deadline:
+            return False
+        await asyncio.sleep(0.01)
+
+
+async def _wait_for_content(page, pending: set, options: RenderOptions) -> bool:
+    """与同步版 _wait_for_content 相同的事件驱动等待，所有等待共享 load_timeout 上限。"""
+    deadline = time.monotonic() + options.load_timeout
+    height = None
+    while True:
+        remaining_ms = max(0, int((deadline - time.monotonic()) * 1000))
+        new_height = await page.evaluate(SCROLL_THROUGH_JS, remaining_ms)
+        remaining_ms = max(0, int((deadline - time.monotonic()) * 1000))
+        if not await page.evaluate(WAIT_ASSETS_JS, remaining_ms):
+            return False
+        if not await _wait_for_network_quiet(pending, deadline, options.network_quiet):
+            return False
+        if new_height == height:
+            return True
+        height = new_height
+        if time.monotonic() >= deadline:
+            return False
+
+
+async def _wait_for_ready(page, options: RenderOptions) -> bool:
+    """等待 ready_selector 出现、ready_function 返回真值；超时返回 False。"""
+    from playwright.async_api import TimeoutError as PlaywrightTimeoutError
+
+    timeout_ms = options.load_timeout * 1000
+    try:
+        if options.ready_selector:
+            await page.wait_for_selector(options.ready_selector, state='attached',
+                                         timeout=timeout_ms)
+        if options.ready_function:
+            await page.wait_for_function(options.ready_function, timeout=timeout_ms)
+    except PlaywrightTimeoutError:
+        return False
+    return True
+
+
+async def _handle_route(rules: RequestRules, route):
+    """异步API的路由处理函数，执行 RequestRules 的决定。"""
+    request = route.request
+    action, payload = rules.decide(request.url, request.resource_type, request.method)
+    if action == 'abort':
+        await route.abort('blockedbyclient')
+    elif action == 'fulfill':
+        await route.fulfill(status=payload.get('status', 200), path=payload['path'],
+                            headers=payload['headers'])
+    elif action == 'fetch':
+        try:
+            response = await route.fetch()
+            body = await response.body()
+        except Exception:
+            if payload is None:
+                await route.abort('failed')
+                return
+            await route.fulfill(status=payload['status'], path=payload['path'],
+                                headers=payload['headers'])
+            return
+        await asyncio.to_thread(rules.store, request.url, response.status,
+                                response.headers, body)
+        await route.fulfill(response=response, body=body)
+    else:
+        await route.continue_()
+
+
+async def _capture_page(page, html_path: str, output_path: str, options: RenderOptions,
+                        pending: set, pdf_path: str = None) -> str:
+    """加载HTML、等待内容就绪并截图；图片编码等CPU工作放到线程中执行。"""
+    html_path_abs = str(Path(html_path).absolute())
+    await page.goto(f'file://{html_path_abs}', wait_until=options.wait_until)
+    await page.add_style_tag(content=DISABLE_ANIMATION_CSS)
+    await page.evaluate(FORCE_VISIBLE_JS)
+
+    if not await _wait_for_content(page, pending, options):
+        print(f"⚠️  {Path(html_path).name}: 内容加载超过 {options.load_timeout:g} 秒，继续截图")
+    if (options.ready_selector or options.ready_function) and not await _wait_for_ready(
+            page, options):
+        print(f"⚠️  {Path(html_path).name}: 就绪条件在 {options.load_timeout:g} 秒内未满足，继续截图")
+
+    if options.pdf_mode == 'vector':
+        await page.emulate_media(media='screen')
+        try:
+            width, height = await page.evaluate(PAGE_SIZE_JS)
+            await page.pdf(**_vector_pdf_kwargs(output_path, width, height))
+        finally:
+            await page.emulate_media(media='null')
+    elif options.capture == 'tiled':
+        tile_height = options.tile_height or page.viewport_size['height']
+        tiles = TiledOutput(output_path, pdf_path, options)
+        try:
+            width, height = await page.evaluate(PAGE_SIZE_JS)
+            for clip in _tile_clips(width, height, tile_height):
+                data = await page.screenshot(clip=clip, full_page=True)
+                await asyncio.to_thread(tiles.add, data)
+        finally:
+            tiles.close()
+    else:
+        kwargs = _full_screenshot_kwargs(output_path, options)
+        data = await page.screenshot(**kwargs)
+        if 'path' not in kwargs:
+            await asyncio.to_thread(_encode_screenshot, data, output_path, options)
+
+    return output_path
+
+
+async def _render_page(page, html_path: str, output_path: str, options: RenderOptions = None,
+                       pdf_path: str = None) -> str:
+    """在已打开的页面上渲染HTML，期间跟踪网络请求以判断懒加载是否完成。"""
+    options = options or RenderOptions()
+    pending = set()
+    on_request = pending.add
+    on_finished = pending.discard
+    page.on('request', on_request)
+    page.on('requestfinished', on_finished)
+    page.on('requestfailed', on_finished)
+
+    rules = RequestRules.for_options(options)
+    if rules is not None:
+        handler = partial(_handle_route, rules)
+        await page.route('**/*', handler)
+    try:
+        return await _capture_page(page, html_path, output_path, options, pending, pdf_path)
+    finally:
+        page.remove_listener('request', on_request)
+        page.remove_listener('requestfinished', on_finished)
+        page.remove_listener('requestfailed', on_finished)
+        if rules is not None:
+            await page.unroute('**/*', handler)
+            await asyncio.to_thread(rules.finish)
+
+
+def _remove_partial(*paths):
+    """删除被取消或失败的渲染留下的不完整输出。"""
+    for path in paths:
+        if path and os.path.exists(path):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+class AsyncBrowserPool:
+    """
+    异步常驻Chromium浏览器池。
+
+    只启动一次浏览器，最多同时打开 pool_size 个页面（每个页面独占一个浏览器
+    上下文），即同一时刻最多 pool_size 个渲染并发进行，其余调用排队等待。
+    渲染被取消（任务取消或超时）时，对应上下文直接关闭重建，不完整的输出会被删除。
+    """
+
+    def __init__(self, pool_size: int = 4, viewport: dict = None, recycle_after: int = 50,
+                 timeout: float = None):
+        if pool_size < 1:
+            raise ValueError(f"pool_size 必须 >= 1: {pool_size}")
+        self.pool_size = pool_size
+        self.viewport = dict(viewport or DEFAULT_VIEWPORT)
+        self.recycle_after = recycle_after
+        self.timeout = timeout
+        self._playwright = None
+        self._browser = None
+        self._start_lock = asyncio.Lock()
+        self._slots = asyncio.Semaphore(pool_size)
+        self._idle = []
+        self._uses = {}
+
+    async def start(self) -> "AsyncBrowserPool":
+        """启动Playwright与Chromium（重复调用无副作用）。"""
+        async with self._start_lock:
+            if self._browser is None:
+                async_playwright = _import_async_playwright()
+                self._playwright = await async_playwright().start()
+                self._browser = await self._playwright.chromium.launch()
+        return self
+
+    async def close(self):
+        """关闭所有页面、浏览器以及Playwright。"""
+        for page in self._idle:
+            await self._discard(page)
+        self._idle = []
+        if self._browser is not None:
+            await self._browser.close()
+            self._browser = None
+        if self._playwright is not None:
+            await self._playwright.stop()
+            self._playwright = None
+
+    async def __aenter__(self):
+        return await self.start()
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    async def _new_page(self):
+        context = await self._browser.new_context(viewport=self.viewport)
+        if self.timeout is not None:
+            context.set_default_timeout(self.timeout * 1000)
+        page = await context.new_page()
+        self._uses[id(page)] = 0
+        return page
+
+    async def _discard(self, page):
+        self._uses.pop(id(page), None)
+        try:
+            await page.context.close()
+        except Exception:
+            pass
+
+    async def acquire(self):
+        """等待空闲名额并取出一个页面。"""
+        await self.start()
+        await self._slots.acquire()
+        try:
+            return self._idle.pop() if self._idle else await self._new_page()
+        except BaseException:
+            self._slots.release()
+            raise
+
+    async def release(self, page, broken: bool = False):
+        """归还页面；页面出错、被取消或达到复用上限时重建上下文。"""
+        try:
+            uses = self._uses.get(id(page), 0) + 1
+            if broken or page.is_closed() or uses >= self.recycle_after:
+                await self._discard(page)
+            else:
+                self._uses[id(page)] = uses
+                self._idle.append(page)
+        finally:
+            self._slots.release()
+
+    async def render(self, html_path: str, output_path: str = None,
+                     options: RenderOptions = None, pdf_path: str = None,
+                     timeout: float = None) -> str:
+        """
+        使用池中的页面渲染一个HTML文件。
+
+        timeout（秒）从取到页面后开始计时，排队等待空闲页面的时间不计入；
+        超时抛出 asyncio.TimeoutError。
+        """
+        if not os.path.exists(html_path):
+            raise FileNotFoundError(f"HTML文件不存在: {html_path}")
+        if output_path is None:
+            output_path = _default_output_path(html_path)
+
+        page = await self.acquire()
+        broken = False
+        try:
+            return await asyncio.wait_for(
+                _render_page(page, html_path, output_path, options, pdf_path), timeout)
+        except BaseException:
+            # 包括 asyncio.CancelledError：页面可能停在任意状态，不再复用
+            broken = True
+            _remove_partial(output_path, pdf_path)
+            raise
+        finally:
+            await asyncio.shield(self.release(page, broken=broken))
+
+
+async def _render_with_pool(pool: AsyncBrowserPool, html_path: str, output_path: str,
+                            options: RenderOptions, pdf_path: str = None,
+                            timeout: float = None) -> str:
+    if pool is not None:
+        return await pool.render(html_path, output_path, options, pdf_path, timeout)
+    async with AsyncBrowserPool(pool_size=1) as own_pool:
+        return await own_pool.render(html_path, output_path, options, pdf_path, timeout)
+
+
+async def html_to_long_image_async(html_path: str, output_path: str = None,
+                                   pool: AsyncBrowserPool = None,
+                                   options: RenderOptions = None,
+                                   pdf_path: str = None, timeout: float = None) -> str:
+    """
+    html_to_long_image 的异步版本。
+
+    Args:
+        html_path: HTML文件路径
+        output_path: 输出图片路径（可选）
+        pool: 已启动的异步浏览器池（可选，不传时临时启动一个）
+        options: 渲染选项（可选）
+        pdf_path: 平铺截图时同步流式写出的PDF路径（可选，仅 capture='tiled' 时生效）
+        timeout: 渲染超时时间（秒，可选），从取到页面后开始计时，排队时间不计入
+
+    Returns:
+        生成的图片路径
+    """
+    if not os.path.exists(html_path):
+        raise FileNotFoundError(f"HTML文件不存在: {html_path}")
+    if output_path is None:
+        output_path = _default_output_path(html_path)
+    await _render_with_pool(pool, html_path, output_path, options, pdf_path, timeout)
+    return str(output_path)
+
+
+async def html_to_vector_pdf_async(html_path: str, pdf_path: str = None,
+                                   pool: AsyncBrowserPool = None,
+                                   options: RenderOptions = None,
+                                   timeout: float = None) -> str:
+    """html_to_vector_pdf 的异步版本：Chromium直接打印单页矢量PDF（timeout 同上）。"""
+    if not os.path.exists(html_path):
+        raise FileNotFoundError(f"HTML文件不存在: {html_path}")
+    if pdf_path is None:
+        pdf_path = _default_output_path(html_path, suffix='.pdf')
+    options = replace(options or RenderOptions(), pdf_mode='vector')
+    await _render_with_pool(pool, html_path, pdf_path, options, timeout=timeout)
+    return str(pdf_path)
+
+
+async def image_to_pdf_async(image_path: str, pdf_path: str = None, strip_height: int = 1024,
+                             jpeg_quality: int = None) -> str:
+    """
+    image_to_pdf 的异步版本。
+
+    转换是纯CPU/磁盘工作，放在线程中执行，不阻塞事件循环。
+    """
+    return await asyncio.to_thread(image_to_pdf, image_path, pdf_path, strip_height,
+                                   jpeg_quality)
+
+
+async def _convert_one_async(pool: AsyncBrowserPool, html_path: str, output_dir: str,
+                             to_pdf: bool, options: RenderOptions,
+                             timeout: float = None) -> dict:
+    """
+    转换单个文件并返回结果字典（不抛出异常）。
+
+    timeout 只限制渲染本身：等待浏览器池空闲页面的时间不计入，超时会取消渲染。
+    """
+    result = {'input': html_path, 'image': None, 'pdf': None,
+              'ok': False, 'error': None, 'seconds': 0.0}
+    start = time.perf_counter()
+
+    async def convert():
+        if options.pdf_mode == 'vector':
+            result['pdf'] = await html_to_vector_pdf_async(
+                html_path, _default_output_path(html_path, output_dir, '.pdf'),
+                pool=pool, options=options, timeout=timeout)
+            return
+        image_path = _default_output_path(html_path, output_dir,
+                                          IMAGE_FORMATS[options.image_format])
+        pdf_path = str(Path(image_path).with_suffix('.pdf')) if to_pdf else None
+        tiled_pdf = pdf_path if options.capture == 'tiled' else None
+        result['image'] = await html_to_long_image_async(
+            html_path, image_path, pool=pool, options=options, pdf_path=tiled_pdf,
+            timeout=timeout)
+        if pdf_path and not tiled_pdf:
+            result['pdf'] = await image_to_pdf_async(
+                image_path, pdf_path, jpeg_quality=_pdf_jpeg_quality(options))
+        else:
+            result['pdf'] = tiled_pdf
+
+    try:
+        await convert()
+        result['ok'] = True
+    except asyncio.TimeoutError:
+        result['error'] = f"超时（>{timeout:g} 秒）"
+    except Exception as e:
+        result['error'] = str(e)
+    result['seconds'] = time.perf_counter() - start
+    return result
+
+
+async def html_to_long_images_async(html_paths, output_dir: str = None, concurrency: int = 4,
+                                    to_pdf: bool = True, timeout: float = None,
+                                    options: RenderOptions = None,
+                                    pool: AsyncBrowserPool = None) -> list:
+    """
+    在同一个事件循环中并发转换多个HTML。
+
+    Args:
+        html_paths: HTML文件路径列表（可包含通配符）
+        output_dir: 输出目录（可选，默认与各HTML同目录）
+        concurrency: 同时渲染的页面数上限（传入 pool 时以 pool.pool_size 为准）
+        to_pdf: 是否同时生成PDF
+        timeout: 单个文件的渲染超时时间（秒，可选，排队时间不计入），超时的渲染会被取消
+        options: 渲染选项（可选）
+        pool: 已启动的异步浏览器池（可选）
+
+    Returns:
+        与输入顺序一致的结果字典列表，包含 input、image、pdf、ok、error、seconds
+    """
+    options = options or RenderOptions()
+    paths = expand_html_inputs(html_paths)
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+
+    async def run(active_pool):
+        return await asyncio.gather(*(
+            _convert_one_async(active_pool, path, output_dir, to_pdf, options, timeout)
+            for path in paths
+        ))
+
+    if pool is not None:
+        return list(await run(pool))
+    async with AsyncBrowserPool(pool_size=concurrency) as own_pool:
+        return list(await run(own_pool))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='在单个事件循环中并发将HTML渲染为长图/PDF')
+    parser.add_argument('inputs', nargs='+', help='HTML文件路径，可传多个或使用通配符')
+    parser.add_argument('--output-dir', help='输出目录（默认与HTML同目录）')
+    parser.add_argument('--concurrency', type=int, default=4, help='同时渲染的页面数（默认: 4）')
+    parser.add_argument('--timeout', type=float, help='单个文件的超时时间（秒）')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    results = asyncio.run(html_to_long_images_async(
+        args.inputs, args.output_dir, args.concurrency, timeout=args.timeout))
+    print_batch_summary(results, time.perf_counter() - start)
+    sys.exit(0 if all(r['ok'] for r in results) else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,317 @@
+#!/usr/bin/env python3
+"""
+HTML渲染常驻服务
+保持一个预热的Chromium浏览器池，通过本地套接字接收渲染任务，
+让每次命令行调用只需发送请求，不再承担Python导入和浏览器启动的开销。
+
+协议：每个请求和响应都是一行JSON（UTF-8，以换行结尾）。
+
+    {"html_path": "report.html", "output_dir": "out", "options": {"pdf_mode": "vector"}}
+    {"html": "<h1>Hi</h1>", "base_dir": "/path/to/assets", "to_pdf": false}
+    {"jobs": [{...}, {...}]}            # 批量，返回 {"results": [...]}
+    {"cmd": "stats"}                    # 队列深度、延迟等指标
+    {"cmd": "shutdown"}
+
+用法:
+    python render_server.py                       # 监听默认Unix套接字
+    python render_server.py --listen 127.0.0.1:8765 --pool-size 8
+    python html_to_long_image.py report.html --server   # 作为客户端提交任务
+"""
+
+import argparse
+import asyncio
+import collections
+import getpass
+import ipaddress
+import json
+import os
+import re
+import socket
+import tempfile
+import time
+from dataclasses import asdict, fields
+from pathlib import Path
+
+from html_to_long_image import RenderOptions, _percentile, expand_html_inputs
+from html_to_long_image_async import AsyncBrowserPool, _convert_one_async
+
+# 单行请求的最大长度（内联HTML可能较大）
+STREAM_LIMIT = 64 * 1024 * 1024
+
+
+def _inject_base(html: str, href: str) -> str:
+    """
+    在文档头部插入 <base>，保持 DOCTYPE 仍是第一个标记（否则页面进入怪异模式）。
+
+    Args:
+        html: HTML文本
+        href: <base> 的 href
+
+    Returns:
+        插入后的HTML
+    """
+    tag = f'<base href="{href}">'
+    # 优先 <head> 之后，其次 <html> 或 DOCTYPE 之后
+    for pattern in (r'<head\b[^>]*>', r'<html\b[^>]*>', r'<!doctype[^>]*>'):
+        match = re.search(pattern, html, re.IGNORECASE)
+        if match:
+            return f'{html[:match.end()]}\n{tag}{html[match.end():]}'
+    return f'{tag}\n{html}'
+
+
+def default_address() -> str:
+    """默认监听地址：支持Unix套接字的平台使用当前用户专属的套接字文件。"""
+    if hasattr(socket, 'AF_UNIX'):
+        runtime_dir = os.environ.get('XDG_RUNTIME_DIR') or tempfile.gettempdir()
+        return os.path.join(runtime_dir, f'html-to-pdf-{getpass.getuser()}.sock')
+    return '127.0.0.1:8765'
+
+
+def _parse_address(address: str):
+    """'host:port' 解析为 TCP 地址，其余视为Unix套接字路径。"""
+    host, sep, port = address.rpartition(':')
+    if sep and port.isdigit() and os.sep not in address:
+        return host or '127.0.0.1', int(port)
+    return address
+
+
+def _is_loopback(host: str) -> bool:
+    """host 是否只解析到本机回环地址。"""
+    try:
+        infos = socket.getaddrinfo(host.strip("[]"), None)
+    except socket.gaierror:
+        return False
+    return bool(infos) and all(ipaddress.ip_address(info[4][0].split('%')[0]).is_loopback
+                               for info in infos)
+
+
+def _check_listen_address(target) -> None:
+    """
+    拒绝非回环的TCP监听地址。
+
+    服务没有身份验证，任何能连上的客户端都可以渲染 file:// 路径，
+    并把输出写到服务进程用户可写的任意位置，所以只允许本机连接。
+    """
+    if isinstance(target, tuple) and not _is_loopback(target[0]):
+        raise ValueError(f"只能监听本机回环地址（如 127.0.0.1），拒绝 {target[0]}: "
+                         "服务没有身份验证")
+
+
+def _build_options(data: dict) -> RenderOptions:
+    """从请求中的 options 字典构造 RenderOptions，忽略未知字段。"""
+    known = {f.name for f in fields(RenderOptions)}
+    return RenderOptions(**{k: v for k, v in (data or {}).items() if k in known})
+
+
+class RenderServer:
+    """
+    常驻渲染服务。
+
+    所有任务共享一个 AsyncBrowserPool，同一时刻最多 pool_size 个页面在渲染，
+    其余任务排队；任务的超时从取到页面后开始计时，排队时间不计入。内联HTML写入临时目录后渲染（可通过 base_dir 指定相对资源的根目录）。
+    """
+
+    def __init__(self, pool_size: int = 4, timeout: float = None, history: int = 1000):
+        self.pool = AsyncBrowserPool(pool_size=pool_size)
+        self.timeout = timeout
+        self.started_at = time.time()
+        self.in_flight = 0
+        self.completed = 0
+        self.failed = 0
+        self.latencies = collections.deque(maxlen=history)
+        self._tmpdir = tempfile.TemporaryDirectory(prefix='html-to-pdf-')
+        self._inline_count = 0
+        self._stopped = asyncio.Event()
+
+    def stats(self) -> dict:
+        """返回服务指标：排队数、进行中任务、完成/失败计数及延迟分位数。"""
+        latencies = list(self.latencies)
+        return {
+            'uptime_seconds': round(time.time() - self.started_at, 1),
+            'pool_size': self.pool.pool_size,
+            'in_flight': self.in_flight,
+            'queue_depth': max(0, self.in_flight - self.pool.pool_size),
+            'completed': self.completed,
+            'failed': self.failed,
+            'latency_p50': _percentile(latencies, 0.50),
+            'latency_p95': _percentile(latencies, 0.95),
+            'latency_max': max(latencies) if latencies else None,
+        }
+
+    def _inline_html_path(self, job: dict) -> str:
+        """把内联HTML写入临时文件；指定 base_dir 时注入 <base> 以解析相对资源。"""
+        self._inline_count += 1
+        name = os.path.basename(job.get('name') or f'inline_{self._inline_count}')
+        path = os.path.join(self._tmpdir.name, f'{self._inline_count}', f'{name}.html')
+        os.makedirs(os.path.dirname(path))
+        html = job['html']
+        if job.get('base_dir'):
+            base = Path(os.path.abspath(job['base_dir'])).as_uri().rstrip('/') + '/'
+            html = _inject_base(html, base)
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(html)
+        return path
+
+    async def run_job(self, job: dict) -> dict:
+        """执行一个渲染任务，返回结果字典。"""
+        inline = 'html' in job
+        if inline:
+            html_path = self._inline_html_path(job)
+            output_dir = job.get('output_dir') or os.getcwd()
+        else:
+            html_path = job['html_path']
+            output_dir = job.get('output_dir')
+        if output_dir:
+            os.makedirs(output_dir, exist_ok=True)
+
+        self.in_flight += 1
+        try:
+            result = await _convert_one_async(
+                self.pool, html_path, output_dir, job.get('to_pdf', True),
+                _build_options(job.get('options')), job.get('timeout', self.timeout))
+        finally:
+            self.in_flight -= 1
+            if inline:
+                os.remove(html_path)
+
+        self.latencies.append(round(result['seconds'], 4))
+        if result['ok']:
+            self.completed += 1
+        else:
+            self.failed += 1
+        return result
+
+    async def handle_request(self, request: dict) -> dict:
+        cmd = request.get('cmd')
+        if cmd == 'stats':
+            return self.stats()
+        if cmd == 'shutdown':
+            self._stopped.set()
+            return {'ok': True}
+        if 'jobs' in request:
+            results = await asyncio.gather(*(self.run_job(job) for job in request['jobs']))
+            return {'results': list(results)}
+        return await self.run_job(request)
+
+    async def handle_connection(self, reader, writer):
+        """每个连接可以依次发送多行请求。"""
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    response = await self.handle_request(json.loads(line))
+                except Exception as e:
+                    response = {'ok': False, 'error': f'{type(e).__name__}: {e}'}
+                writer.write(json.dumps(response, ensure_ascii=False).encode() + b'\n')
+                await writer.drain()
+        finally:
+            writer.close()
+
+    async def serve(self, address: str):
+        """启动浏览器池并监听 address，直到收到 shutdown 请求或被中断。"""
+        target = _parse_address(address)
+        _check_listen_address(target)
+        await self.pool.start()
+        if isinstance(target, tuple):
+            server = await asyncio.start_server(self.handle_connection, *target,
+                                                limit=STREAM_LIMIT)
+        else:
+            if os.path.exists(target):
+                os.remove(target)
+            server = await asyncio.start_unix_server(self.handle_connection, target,
+                                                     limit=STREAM_LIMIT)
+            os.chmod(target, 0o600)
+        print(f"🚀 渲染服务已启动: {address}（浏览器池 {self.pool.pool_size} 个页面）")
+        try:
+            async with server:
+                await self._stopped.wait()
+        finally:
+            await self.pool.close()
+            self._tmpdir.cleanup()
+            if not isinstance(target, tuple) and os.path.exists(target):
+                os.remove(target)
+        print("👋 渲染服务已停止")
+
+
+def request(payload: dict, address: str = None, timeout: float = None) -> dict:
+    """
+    向渲染服务发送一个请求并返回响应（同步客户端，仅依赖标准库）。
+
+    Args:
+        payload: 请求字典，见模块说明中的协议
+        address: 服务地址（默认与服务端默认值相同）
+        timeout: 等待响应的超时时间（秒，可选）
+
+    Returns:
+        响应字典
+    """
+    target = _parse_address(address or default_address())
+    if isinstance(target, tuple):
+        sock = socket.create_connection(target, timeout=timeout)
+    else:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(timeout)
+        sock.connect(target)
+    with sock, sock.makefile('rwb') as stream:
+        stream.write(json.dumps(payload, ensure_ascii=False).encode() + b'\n')
+        stream.flush()
+        line = stream.readline()
+    if not line:
+        raise ConnectionError(f"渲染服务无响应: {address}")
+    return json.loads(line)
+
+
+def submit(html_paths, output_dir: str = None, to_pdf: bool = True,
+           options: RenderOptions = None, address: str = None,
+           timeout: float = None, render_timeout: float = None) -> list:
+    """
+    把一批HTML作为一个批量请求提交给渲染服务，返回每个文件的结果。
+
+    timeout 是等待整个响应的套接字超时；render_timeout 是每个文件的渲染超时
+    （不传时使用服务端 --timeout）。服务返回错误时抛出 RuntimeError。
+    """
+    options_dict = asdict(options) if options is not None else {}
+    jobs = [{'html_path': os.path.abspath(path),
+             'output_dir': os.path.abspath(output_dir) if output_dir else None,
+             'to_pdf': to_pdf, 'options': options_dict}
+            for path in expand_html_inputs(html_paths)]
+    if render_timeout is not None:
+        for job in jobs:
+            job['timeout'] = render_timeout
+    response = request({'jobs': jobs}, address, timeout)
+    if 'results' not in response:
+        raise RuntimeError(f"渲染服务返回错误: {response.get('error', response)}")
+    return response['results']
+
+
+def main():
+    parser = argparse.ArgumentParser(description='HTML渲染常驻服务（预热浏览器池 + 本地套接字）')
+    parser.add_argument('--listen', default=default_address(),
+                        help='Unix套接字路径或本机回环 host:port（默认: %(default)s）')
+    parser.add_argument('--pool-size', type=int, default=4, help='并发渲染的页面数（默认: 4）')
+    parser.add_argument('--timeout', type=float, help='单个任务的默认渲染超时时间（秒，排队时间不计入）')
+    parser.add_argument('--stats', action='store_true', help='查询运行中服务的指标后退出')
+    parser.add_argument('--shutdown', action='store_true', help='停止运行中的服务')
+    args = parser.parse_args()
+
+    if args.stats or args.shutdown:
+        response = request({'cmd': 'stats' if args.stats else 'shutdown'}, args.listen, 10)
+        print(json.dumps(response, ensure_ascii=False, indent=2))
+        return
+
+    try:
+        _check_listen_address(_parse_address(args.listen))
+    except ValueError as e:
+        parser.error(str(e))
+
+    server = RenderServer(pool_size=args.pool_size, timeout=args.timeout)
+    try:
+        asyncio.run(server.serve(args.listen))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -2,26 +2,43 @@
 """
 Markdown to PDF Converter
 Converts Markdown files directly to PDF with proper formatting and syntax highlighting.
+
+Heavy dependencies (markdown, WeasyPrint) are imported on first use, so --help,
+input validation and incremental runs with nothing to rebuild never load them.
+Startup target: importing this module stays under 30 ms on top of the bare
+interpreter (check with `python -X importtime markdown_to_pdf.py --help`).
 """
 
 import sys
 import os
+import re
+import glob
+import json
+import time
+import hashlib
+import argparse
+import tempfile
 from pathlib import Path
+from urllib.parse import unquote, urlsplit
 
-def check_dependencies():
-    """Check and install required dependencies."""
-    required = {
-        'markdown': 'markdown',
-        'weasyprint': 'weasyprint',
-        'pygments': 'pygments'
-    }
+__version__ = '1.1.0'
 
+REQUIRED_PACKAGES = {
+    'markdown': 'markdown',
+    'weasyprint': 'weasyprint',
+    'pygments': 'pygments',
+    'pypdf': 'pypdf',
+    'pypdfium2': 'pypdfium2'
+}
+
+def check_dependencies(modules=None):
+    """Check and install required dependencies (all of them, or only the given modules)."""
     missing = []
-    for module, package in required.items():
+    for module in modules or REQUIRED_PACKAGES:
         try:
             __import__(module)
         except ImportError:
-            missing.append(package)
+            missing.append(REQUIRED_PACKAGES[module])
 
     if missing:
         print(f"📦 Installing missing dependencies: {', '.join(missing)}")
@@ -29,11 +46,30 @@ def check_dependencies():
         subprocess.check_call([sys.executable, '-m', 'pip', 'install'] + missing)
         print("✅ Dependencies installed!\n")
 
-check_dependencies()
+def _import_markdown():
+    """Import markdown (and pygments for code highlighting) on first use."""
+    check_dependencies(('markdown', 'pygments'))
+    import markdown
+    return markdown
+
+def _import_pypdf():
+    """Import pypdf on first use (merging chunked output, size reports)."""
+    check_dependencies(('pypdf',))
+    import pypdf
+    return pypdf
 
-import markdown
-from weasyprint import HTML, CSS
-from markdown.extensions import fenced_code, tables, codehilite, toc
+def _import_pdfium():
+    """Import pypdfium2 on first use (only needed for PNG page thumbnails)."""
+    check_dependencies(('pypdfium2',))
+    import pypdfium2
+    return pypdfium2
+
+def _import_weasyprint():
+    """Import WeasyPrint on first use; returns (HTML, CSS, FontConfiguration)."""
+    check_dependencies(('weasyprint',))
+    from weasyprint import HTML, CSS
+    from weasyprint.text.fonts import FontConfiguration
+    return HTML, CSS, FontConfiguration
 
 def get_css_style():
     """Return CSS styling for the PDF."""
@@ -197,8 +233,737 @@ def get_css_style():
     .codehilite .nv { color: #e36209 } /* Name.Variable */
     """
 
-def convert_markdown_to_pdf(input_file, output_file=None):
-    """Convert Markdown file to PDF."""
+# Unlabelled code blocks longer than this (in characters) are not passed to
+# Pygments' lexer guessing, which runs every lexer over the text
+DEFAULT_GUESS_LIMIT = 4000
+
+DEFAULT_HIGHLIGHT_CACHE_DIR = os.path.join(
+    os.environ.get('XDG_CACHE_HOME', os.path.expanduser('~/.cache')), 'markdown-to-pdf', 'highlight')
+
+# Code blocks as emitted by codehilite with use_pygments disabled and by the
+# fenced block preprocessor below. Requiring class="codehilite" leaves raw
+# <pre><code> HTML from the author alone; the other <pre> attributes carry the
+# fence's id, extra classes and hl_lines
+CODE_BLOCK_RE = re.compile(
+    r'<pre class="codehilite"([^>]*)><code(?: class="([^"]*)")?>(.*?)</code></pre>',
+    re.DOTALL
+)
+
+CODE_BLOCK_ATTR_RE = re.compile(r'([\w-]+)="([^"]*)"')
+
+class CodeHighlighter:
+    """
+    Pygments highlighting for code blocks with a cache keyed by
+    (code, language, style).
+
+    Registered as a Markdown postprocessor: codehilite only marks up the
+    blocks, and this pass highlights them, keeping a fenced block's id, extra
+    classes and hl_lines as codehilite would. Results are memoised in memory and,
+    with cache_dir, persisted as one file per block so later runs and worker
+    processes reuse them. Labelled blocks never go through lexer guessing; an
+    unknown label falls back to plain text. Unlabelled blocks are guessed only
+    up to guess_limit characters (0 disables guessing).
+    """
+
+    def __init__(self, cache_dir=None, style='default', guess_limit=DEFAULT_GUESS_LIMIT):
+        from pygments import __version__ as pygments_version
+        from pygments.formatters import HtmlFormatter
+        self.cache_dir = cache_dir
+        self.style = style
+        self.guess_limit = guess_limit
+        self.version = pygments_version
+        self.memory = {}
+        self.hits = 0
+        self.misses = 0
+        # Formatters are built once; blocks with hl_lines get one per line set
+        self.formatters = {(): HtmlFormatter(cssclass='codehilite', wrapcode=True, style=style)}
+
+    def _formatter(self, hl_lines):
+        formatter = self.formatters.get(hl_lines)
+        if formatter is None:
+            from pygments.formatters import HtmlFormatter
+            formatter = HtmlFormatter(cssclass='codehilite', wrapcode=True, style=self.style,
+                                      hl_lines=list(hl_lines))
+            self.formatters[hl_lines] = formatter
+        return formatter
+
+    def _key(self, code, lang, hl_lines=()):
+        guess = lang is None and 0 < len(code) <= self.guess_limit
+        data = json.dumps([self.version, self.style, lang, guess, list(hl_lines), code])
+        return hashlib.sha256(data.encode('utf-8')).hexdigest()
+
+    def _lexer(self, code, lang):
+        from pygments.lexers import get_lexer_by_name, guess_lexer
+        from pygments.util import ClassNotFound
+        if lang:
+            try:
+                return get_lexer_by_name(lang)
+            except ClassNotFound:
+                return get_lexer_by_name('text')
+        if 0 < len(code) <= self.guess_limit:
+            try:
+                return guess_lexer(code)
+            except ClassNotFound:
+                pass
+        return get_lexer_by_name('text')
+
+    def highlight(self, code, lang=None, hl_lines=(), classes='', block_id=''):
+        """Return highlighted HTML for one code block."""
+        result = self._highlight(code, lang, tuple(hl_lines))
+        if classes or block_id:
+            # Extra classes go before cssclass as in codehilite; the id goes on the wrapper
+            from html import escape
+            opening = '<div class="codehilite"'
+            marked = f'<div class="{escape(classes)} codehilite"' if classes else opening
+            if block_id:
+                marked += f' id="{escape(block_id)}"'
+            result = result.replace(opening, marked, 1)
+        return result
+
+    def _highlight(self, code, lang, hl_lines):
+        key = self._key(code, lang, hl_lines)
+        html = self.memory.get(key)
+        path = os.path.join(self.cache_dir, key[:2], key) if self.cache_dir else None
+        if html is None and path:
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    html = f.read()
+            except OSError:
+                pass
+        if html is not None:
+            self.hits += 1
+            self.memory[key] = html
+            return html
+
+        self.misses += 1
+        from pygments import highlight
+        html = highlight(code, self._lexer(code, lang), self._formatter(hl_lines))
+        self.memory[key] = html
+        if path:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp = f"{path}.{os.getpid()}.tmp"
+            with open(tmp, 'w', encoding='utf-8') as f:
+                f.write(html)
+            os.replace(tmp, path)
+        return html
+
+    def run(self, text):
+        """Postprocessor entry point: highlight every code block in the HTML."""
+        import html
+
+        def replace(match):
+            attrs = {name: html.unescape(value)
+                     for name, value in CODE_BLOCK_ATTR_RE.findall(match.group(1))}
+            classes = html.unescape(match.group(2) or '').split()
+            lang = next((c[len('language-'):] for c in classes if c.startswith('language-')), None)
+            hl_lines = tuple(int(n) for n in attrs.get('data-hl-lines', '').split())
+            return self.highlight(html.unescape(match.group(3)).strip('\n'), lang, hl_lines,
+                                  attrs.get('data-classes', ''), attrs.get('id', ''))
+
+        return CODE_BLOCK_RE.sub(replace, text)
+
+def build_markdown(highlighter=None):
+    """Create a Markdown parser with the extensions used for PDF output."""
+    markdown = _import_markdown()
+    md = markdown.Markdown(extensions=[
+        'fenced_code',
+        'tables',
+        'codehilite',
+        'toc',
+        'nl2br',
+        'sane_lists'
+    ], extension_configs={
+        'codehilite': {
+            'css_class': 'codehilite',
+            'linenums': False,
+            'use_pygments': False
+        }
+    })
+    fenced = md.preprocessors['fenced_code_block']
+    md.preprocessors.register(_marked_fenced_preprocessor(md, fenced.config),
+                              'fenced_code_block', 25)
+    # Runs after raw HTML (including code blocks) has been restored
+    md.postprocessors.register(highlighter or CodeHighlighter(), 'highlight', 5)
+    return md
+
+def _marked_fenced_preprocessor(md, config):
+    """
+    fenced_code preprocessor that emits blocks marked up for CodeHighlighter.
+
+    With use_pygments disabled, fenced_code emits bare <pre><code> blocks,
+    which look exactly like raw HTML written by the author, and drops
+    hl_lines. This version tags its blocks with class="codehilite" the way
+    codehilite tags indented blocks and keeps the fence's id, extra classes
+    and hl_lines as attributes, so CodeHighlighter renders them as
+    codehilite's own Pygments path would.
+    """
+    import html
+    from markdown.extensions.attr_list import get_attrs_and_remainder
+    from markdown.extensions.codehilite import parse_hl_lines
+    from markdown.extensions.fenced_code import FencedBlockPreprocessor
+
+    class MarkedFencedBlockPreprocessor(FencedBlockPreprocessor):
+        def run(self, lines):
+            text = '\n'.join(lines)
+            index = 0
+            while True:
+                m = self.FENCED_BLOCK_RE.search(text, index)
+                if not m:
+                    break
+                lang, block_id, classes, options = None, '', [], {}
+                if m.group('attrs'):
+                    attrs, remainder = get_attrs_and_remainder(m.group('attrs'))
+                    if remainder:
+                        # Unbalanced braces: not a fenced block, as in fenced_code
+                        index = m.end('attrs')
+                        continue
+                    block_id, classes, options = self.handle_attrs(attrs)
+                    if classes:
+                        lang = classes.pop(0)
+                else:
+                    lang = m.group('lang')
+                    if m.group('hl_lines'):
+                        options['hl_lines'] = parse_hl_lines(m.group('hl_lines'))
+
+                pre_attrs = {'class': 'codehilite', 'id': block_id,
+                             'data-classes': ' '.join(classes),
+                             'data-hl-lines': ' '.join(map(str, options.get('hl_lines') or ()))}
+                pre = ''.join(f' {name}="{html.escape(value)}"'
+                              for name, value in pre_attrs.items() if value)
+                code_class = f' class="language-{html.escape(lang)}"' if lang else ''
+                code = f'<pre{pre}><code{code_class}>{self._escape(m.group("code"))}</code></pre>'
+                placeholder = self.md.htmlStash.store(code)
+                text = f'{text[:m.start()]}\n{placeholder}\n{text[m.end():]}'
+                index = m.start() + 1 + len(placeholder)
+            return text.split('\n')
+
+    return MarkedFencedBlockPreprocessor(md, config)
+
+def wrap_html(html_content, title):
+    """Wrap converted Markdown in a full HTML document."""
+    return f"""
+        <!DOCTYPE html>
+        <html>
+        <head>
+            <meta charset="UTF-8">
+            <title>{title}</title>
+        </head>
+        <body>
+            {html_content}
+        </body>
+        </html>
+        """
+
+# Outputs that can be written next to the PDF from the same parse and layout
+EXTRA_FORMATS = ('html', 'png')
+
+DEFAULT_THUMBNAIL_WIDTH = 400
+
+def extra_output_paths(output_file, formats):
+    """Paths of the extra outputs of a PDF: <name>.html and a <name>_pages/ directory."""
+    stem = Path(output_file).with_suffix('')
+    paths = {}
+    if 'html' in formats:
+        paths['html'] = f'{stem}.html'
+    if 'png' in formats:
+        paths['png'] = f'{stem}_pages'
+    return paths
+
+def standalone_html(full_html, base_url, output_file):
+    """
+    Turn the HTML laid out for the PDF into a browser preview: the stylesheet
+    is inlined, and a <base> keeps relative image paths working when the
+    preview is not written next to its source.
+    """
+    head = f'<style>{get_css_style()}</style>'
+    if os.path.abspath(os.path.dirname(os.path.abspath(output_file))) != os.path.abspath(base_url):
+        head += f'\n<base href="{Path(base_url).absolute().as_uri()}/">'
+    return full_html.replace('</head>', f'{head}\n</head>', 1)
+
+def write_page_thumbnails(pdf, directory, width=DEFAULT_THUMBNAIL_WIDTH):
+    """
+    Rasterise every page of a PDF (path or bytes) to page-NNN.png files of the
+    given pixel width in directory, replacing thumbnails from earlier runs.
+    Returns the list of PNG paths.
+    """
+    pdfium = _import_pdfium()
+    os.makedirs(directory, exist_ok=True)
+    for old in glob.glob(os.path.join(glob.escape(directory), 'page-*.png')):
+        os.remove(old)
+    document = pdfium.PdfDocument(pdf)
+    paths = []
+    try:
+        for index in range(len(document)):
+            page = document[index]
+            bitmap = page.render(scale=width / page.get_width())
+            path = os.path.join(directory, f'page-{index + 1:03d}.png')
+            bitmap.to_pil().save(path)
+            paths.append(path)
+            page.close()
+    finally:
+        document.close()
+    return paths
+
+# Documents longer than this (in characters) are laid out in chunks by --chunked
+DEFAULT_CHUNK_CHARS = 200000
+
+PAGE_NUMBER_CSS = """
+    @page {
+        @bottom-center {
+            content: counter(page);
+            font-size: 9pt;
+            color: #666;
+        }
+    }
+"""
+
+FENCE_RE = re.compile(r'^ {0,3}(`{3,}|~{3,})')
+H1_RE = re.compile(r'^ {0,3}#(?:[ \t]|$)')
+SETEXT_H1_RE = re.compile(r'^ {0,3}=+[ \t]*$')
+REF_DEF_RE = re.compile(r'^ {0,3}\[[^\]]+\]:[ \t]*\S')
+
+def split_markdown(md_content, max_chars=DEFAULT_CHUNK_CHARS):
+    """
+    Split Markdown at top-level headings into chunks of about max_chars.
+
+    Headings inside fenced code are ignored. Consecutive sections are grouped
+    until a chunk would exceed max_chars, and reference-style link definitions
+    are appended to every chunk so links keep resolving.
+    """
+    lines = md_content.splitlines(keepends=True)
+    sections = []
+    current = []
+    ref_defs = []
+    fence = None
+    for index, line in enumerate(lines):
+        match = FENCE_RE.match(line)
+        if fence:
+            if match and match.group(1)[0] == fence[0] and len(match.group(1)) >= len(fence):
+                fence = None
+        elif match:
+            fence = match.group(1)
+        else:
+            next_line = lines[index + 1] if index + 1 < len(lines) else ''
+            starts_h1 = H1_RE.match(line) or (line.strip() and SETEXT_H1_RE.match(next_line))
+            if starts_h1 and current:
+                sections.append(''.join(current))
+                current = []
+            if REF_DEF_RE.match(line):
+                ref_defs.append(line)
+        current.append(line)
+    if current:
+        sections.append(''.join(current))
+
+    chunks = []
+    for section in sections:
+        if chunks and len(chunks[-1]) + len(section) <= max_chars:
+            chunks[-1] += section
+        else:
+            chunks.append(section)
+    if ref_defs and len(chunks) > 1:
+        chunks = [chunk + '\n\n' + ''.join(d for d in ref_defs if d not in chunk)
+                  for chunk in chunks]
+    return chunks or ['']
+
+def merge_pdfs(paths, output_file, title=None):
+    """Concatenate PDFs, keeping each part's bookmarks in one continuous outline."""
+    writer = _import_pypdf().PdfWriter()
+    for path in paths:
+        writer.append(path)
+    if title:
+        writer.add_metadata({'/Title': title})
+    with open(output_file, 'wb') as f:
+        writer.write(f)
+    return len(writer.pages)
+
+def _stream_length(obj):
+    """Stored (still encoded) length of a PDF stream object."""
+    # pypdf drops /Length after reading and keeps the raw bytes in _data
+    data = getattr(obj, '_data', None)
+    return len(data) if data is not None else 0
+
+def pdf_size_report(path):
+    """
+    Break a PDF's size down into embedded fonts, images and everything else.
+
+    Each font file and image is counted once, however many pages use it.
+    Returns a dict with bytes, pages, fonts, font_bytes, images, image_bytes
+    and other_bytes.
+    """
+    reader = _import_pypdf().PdfReader(path)
+    fonts = {}
+    images = {}
+    seen = set()
+
+    def key(ref):
+        return getattr(ref, 'idnum', None) or id(ref.get_object())
+
+    def visit(resources):
+        resources = resources.get_object() if resources is not None else None
+        if not resources or id(resources) in seen:
+            return
+        seen.add(id(resources))
+        for ref in (resources.get('/Font') or {}).values():
+            font = ref.get_object()
+            descriptor = font.get('/FontDescriptor')
+            if descriptor is None and font.get('/DescendantFonts'):
+                descriptor = font['/DescendantFonts'][0].get_object().get('/FontDescriptor')
+            descriptor = descriptor.get_object() if descriptor is not None else {}
+            for name in ('/FontFile', '/FontFile2', '/FontFile3'):
+                if name in descriptor:
+                    fonts[key(descriptor.raw_get(name))] = _stream_length(descriptor[name])
+        for ref in (resources.get('/XObject') or {}).values():
+            xobject = ref.get_object()
+            if xobject.get('/Subtype') == '/Image':
+                size = _stream_length(xobject)
+                if '/SMask' in xobject:
+                    size += _stream_length(xobject['/SMask'].get_object())
+                images[key(ref)] = size
+            elif xobject.get('/Subtype') == '/Form':
+                visit(xobject.get('/Resources'))
+        for ref in (resources.get('/Pattern') or {}).values():
+            visit(ref.get_object().get('/Resources'))
+
+    for page in reader.pages:
+        visit(page.get('/Resources'))
+    total = os.path.getsize(path)
+    font_bytes = sum(fonts.values())
+    image_bytes = sum(images.values())
+    return {'bytes': total, 'pages': len(reader.pages),
+            'fonts': len(fonts), 'font_bytes': font_bytes,
+            'images': len(images), 'image_bytes': image_bytes,
+            'other_bytes': max(0, total - font_bytes - image_bytes)}
+
+def format_size_report(report):
+    """One-line summary of a pdf_size_report() dict."""
+    kb = lambda n: f"{n / 1024:.1f} KB"
+    return (f"{kb(report['bytes'])}，{report['pages']} 页；"
+            f"字体 {report['fonts']} 个 {kb(report['font_bytes'])}；"
+            f"图片 {report['images']} 张 {kb(report['image_bytes'])}；"
+            f"其他 {kb(report['other_bytes'])}")
+
+DEFAULT_IMAGE_CACHE_DIR = os.path.join(
+    os.environ.get('XDG_CACHE_HOME', os.path.expanduser('~/.cache')), 'markdown-to-pdf', 'images')
+
+# Text column width in inches: A4 minus the 2cm margins set in get_css_style()
+CONTENT_WIDTH_INCHES = (21.0 - 4.0) / 2.54
+
+# Images are never shown wider than the text column, so without --image-dpi
+# cached copies keep enough pixels for print at this resolution
+DEFAULT_IMAGE_CACHE_DPI = 300
+
+# WeasyPrint sizes images without a CSS width at 96 pixels per inch, so cached
+# copies never go below the column width at this resolution; lower --image-dpi
+# values are left to WeasyPrint's own downsampling, which keeps the layout size
+CSS_DPI = 96
+
+# Bumped when preprocessing changes, so copies made by older versions are redone
+IMAGE_CACHE_VERSION = 2
+
+CACHEABLE_IMAGE_TYPES = {'.png': 'image/png', '.jpg': 'image/jpeg', '.jpeg': 'image/jpeg'}
+
+class ImageCache:
+    """
+    Preprocessed copies of local PNG and JPEG images, keyed by content hash.
+
+    Each distinct image is decoded once, scaled down to the text column width
+    at dpi (at least CSS_DPI), re-encoded (JPEG at jpeg_quality, PNG with
+    optimize, keeping any colour profile) and stored in
+    cache_dir, so every document, worker process and later run referencing
+    the same bytes reuses the copy. Images that need no change are copied
+    unmodified.
+    """
+
+    def __init__(self, cache_dir=DEFAULT_IMAGE_CACHE_DIR, dpi=None, jpeg_quality=None,
+                 optimize=False):
+        self.cache_dir = cache_dir
+        self.max_width = round(CONTENT_WIDTH_INCHES * max(dpi or DEFAULT_IMAGE_CACHE_DPI, CSS_DPI))
+        self.jpeg_quality = jpeg_quality
+        self.optimize = optimize
+        self.digests = {}
+        self.hits = 0
+        self.misses = 0
+
+    def _digest(self, path):
+        stat = os.stat(path)
+        key = (path, stat.st_mtime_ns, stat.st_size)
+        if key not in self.digests:
+            self.digests[key] = _hash_file(path)
+        return self.digests[key]
+
+    def lookup(self, path):
+        """
+        Return (cached_path, mime_type) for an image file, preprocessing it
+        on a miss, or None for files this cache does not handle.
+        """
+        extension = os.path.splitext(path)[1].lower()
+        mime_type = CACHEABLE_IMAGE_TYPES.get(extension)
+        if mime_type is None or not os.path.isfile(path):
+            return None
+        params = (f'{IMAGE_CACHE_VERSION}-{self._digest(path)}-{self.max_width}-'
+                  f'{self.jpeg_quality}-{int(self.optimize)}')
+        key = hashlib.sha256(params.encode('utf-8')).hexdigest()
+        cached = os.path.join(self.cache_dir, key[:2], key + extension)
+        if os.path.exists(cached):
+            self.hits += 1
+            return cached, mime_type
+
+        self.misses += 1
+        os.makedirs(os.path.dirname(cached), exist_ok=True)
+        tmp = f"{cached}.{os.getpid()}.tmp"
+        self._preprocess(path, tmp, 'JPEG' if mime_type == 'image/jpeg' else 'PNG')
+        os.replace(tmp, cached)
+        return cached, mime_type
+
+    def _preprocess(self, path, output, image_format):
+        import shutil
+        from PIL import Image, ImageOps
+
+        with Image.open(path) as original:
+            # Apply EXIF orientation now; the re-encoded copy carries no EXIF.
+            # exif_transpose() always copies, so only call it for rotated images
+            transformed = original.getexif().get(0x0112, 1) != 1
+            image = ImageOps.exif_transpose(original) if transformed else original
+            if image.width > self.max_width:
+                if image.mode in ('1', 'P'):
+                    image = image.convert('RGBA')
+                height = max(1, round(image.height * self.max_width / image.width))
+                image = image.resize((self.max_width, height), Image.LANCZOS)
+                transformed = True
+            if image_format == 'JPEG':
+                recompress = self.jpeg_quality is not None or self.optimize
+                options = {'quality': self.jpeg_quality or 90, 'optimize': self.optimize}
+            else:
+                recompress = self.optimize
+                options = {'optimize': self.optimize}
+            # The JPEG encoder only writes a colour profile it is given explicitly
+            if original.info.get('icc_profile'):
+                options['icc_profile'] = original.info['icc_profile']
+            if transformed or recompress:
+                image.save(output, format=image_format, **options)
+        # Pure recompression that doesn't pay off keeps the original bytes
+        if not transformed and (not recompress
+                                or os.path.getsize(output) >= os.path.getsize(path)):
+            shutil.copyfile(path, output)
+
+def caching_url_fetcher(image_cache):
+    """
+    WeasyPrint URL fetcher that serves local images from an ImageCache.
+
+    Responses point at the cached file, so WeasyPrint embeds the preprocessed
+    copy instead of rereading the original. Other URLs, and images that fail
+    to preprocess, go through WeasyPrint's default fetcher.
+    """
+    from urllib.request import url2pathname
+
+    def cached(url):
+        if not url.startswith('file:'):
+            return None
+        try:
+            return image_cache.lookup(url2pathname(urlsplit(url).path))
+        except Exception:
+            return None
+
+    try:
+        from weasyprint.urls import URLFetcher, URLFetcherResponse
+    except ImportError:
+        # Older WeasyPrint releases take a function returning a dict
+        from weasyprint import default_url_fetcher
+
+        def fetch(url, *args, **kwargs):
+            entry = cached(url)
+            if entry is None:
+                return default_url_fetcher(url, *args, **kwargs)
+            with open(entry[0], 'rb') as f:
+                return {'string': f.read(), 'mime_type': entry[1], 'redirected_url': url}
+        return fetch
+
+    class CachingURLFetcher(URLFetcher):
+        def fetch(self, url, headers=None):
+            entry = cached(url)
+            if entry is None:
+                return super().fetch(url, headers)
+            with open(entry[0], 'rb') as f:
+                return URLFetcherResponse(Path(entry[0]).as_uri(), f.read(),
+                                          {'Content-Type': entry[1]})
+
+    return CachingURLFetcher()
+
+class MarkdownConverter:
+    """
+    Reusable Markdown to PDF converter.
+
+    Builds the Markdown parser, the parsed stylesheet and the WeasyPrint font
+    configuration once, so converting many files in one process only pays for
+    parsing and layout of each document. Code highlighting results are shared
+    through a CodeHighlighter (see highlight_cache and guess_limit).
+
+    With chunk_chars, documents longer than that are split at top-level
+    headings and each chunk is laid out on its own, so peak memory follows the
+    chunk size rather than the document size. page_numbers adds a page number
+    footer, which stays continuous across chunks.
+
+    Output size: embedded fonts are subset to the glyphs used unless
+    full_fonts is set (hinting keeps hinting tables in the subsets). Images
+    are downsampled to image_dpi at their printed size, JPEGs are re-encoded
+    at jpeg_quality, and optimize_images recompresses the remaining images.
+
+    Decoded images are shared by every document this converter renders, and
+    with image_cache (a directory) local images are preprocessed once into an
+    ImageCache shared across processes and runs.
+
+    extra_formats adds outputs from the same parse and layout: 'html' writes
+    a standalone preview and 'png' rasterises page thumbnails of
+    thumbnail_width pixels from the finished PDF.
+    """
+
+    def __init__(self, highlight_cache=None, guess_limit=DEFAULT_GUESS_LIMIT,
+                 chunk_chars=None, page_numbers=False, image_dpi=None,
+                 jpeg_quality=None, optimize_images=False, full_fonts=False,
+                 hinting=False, image_cache=None, extra_formats=(),
+                 thumbnail_width=DEFAULT_THUMBNAIL_WIDTH):
+        unknown = set(extra_formats) - set(EXTRA_FORMATS)
+        if unknown:
+            raise ValueError(f"Unknown output formats: {', '.join(sorted(unknown))}")
+        HTML, CSS, FontConfiguration = _import_weasyprint()
+        self.options = {'highlight_cache': highlight_cache, 'guess_limit': guess_limit,
+                        'chunk_chars': chunk_chars, 'page_numbers': page_numbers,
+                        'image_dpi': image_dpi, 'jpeg_quality': jpeg_quality,
+                        'optimize_images': optimize_images, 'full_fonts': full_fonts,
+                        'hinting': hinting, 'image_cache': image_cache,
+                        'extra_formats': extra_formats, 'thumbnail_width': thumbnail_width}
+        # WeasyPrint reads image options at layout and font options when writing
+        self.pdf_options = {'dpi': image_dpi, 'jpeg_quality': jpeg_quality,
+                            'optimize_images': optimize_images, 'full_fonts': full_fonts,
+                            'hinting': hinting}
+        self.highlighter = CodeHighlighter(highlight_cache, guess_limit=guess_limit)
+        self.image_cache = None
+        self.url_fetcher = None
+        if image_cache:
+            self.image_cache = ImageCache(image_cache, image_dpi, jpeg_quality, optimize_images)
+            self.url_fetcher = caching_url_fetcher(self.image_cache)
+        # WeasyPrint's image cache, keyed by URL and kept across documents
+        self.images = {}
+        self.md = build_markdown(self.highlighter)
+        self.html_class = HTML
+        self.css_class = CSS
+        self.chunk_chars = chunk_chars
+        self.page_numbers = page_numbers
+        self.extra_formats = tuple(extra_formats)
+        self.thumbnail_width = thumbnail_width
+        self.font_config = FontConfiguration()
+        self.stylesheets = [CSS(string=get_css_style(), font_config=self.font_config)]
+        if page_numbers:
+            self.stylesheets.append(CSS(string=PAGE_NUMBER_CSS, font_config=self.font_config))
+
+    def to_html(self, md_content, title):
+        """Convert Markdown text to a full HTML document."""
+        self.md.reset()
+        return wrap_html(self.md.convert(md_content), title)
+
+    def write_pdf(self, full_html, output_file, base_url, first_page=1):
+        """
+        Lay out an HTML document and write it to a PDF file.
+
+        first_page sets the page counter of the first page (used by chunks).
+        Returns the number of pages.
+        """
+        stylesheets = self.stylesheets
+        if first_page != 1:
+            stylesheets = stylesheets + [self.css_class(
+                string=f'@page :first {{ counter-reset: page {first_page} }}',
+                font_config=self.font_config)]
+        html = self.html_class(string=full_html, base_url=base_url, url_fetcher=self.url_fetcher)
+        document = html.render(
+            stylesheets=stylesheets,
+            font_config=self.font_config,
+            cache=self.images,
+            **self.pdf_options
+        )
+        document.write_pdf(output_file, **self.pdf_options)
+        return len(document.pages)
+
+    def needs_chunking(self, md_content):
+        return bool(self.chunk_chars) and len(md_content) > self.chunk_chars
+
+    def write_chunked(self, md_content, title, base_url, output_file, jobs=1):
+        """
+        Lay out a document chunk by chunk and merge the parts into output_file.
+
+        With jobs > 1 chunks are laid out in worker processes. Page counts are
+        only known after layout, so with page numbers every chunk after the
+        first is laid out a second time with its final starting page.
+        Returns the total number of pages.
+        """
+        chunks = split_markdown(md_content, self.chunk_chars or DEFAULT_CHUNK_CHARS)
+        with tempfile.TemporaryDirectory(prefix='markdown-to-pdf-') as tmpdir:
+            paths = [os.path.join(tmpdir, f'{index:05d}.pdf') for index in range(len(chunks))]
+            if jobs <= 1 or len(chunks) == 1:
+                first_page = 1
+                for chunk, path in zip(chunks, paths):
+                    first_page += self.write_pdf(self.to_html(chunk, title), path, base_url,
+                                                 first_page)
+            else:
+                from concurrent.futures import ProcessPoolExecutor
+
+                with ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker,
+                                         initargs=(self.options,)) as executor:
+                    tasks = [(chunk, title, base_url, path, 1) for chunk, path in zip(chunks, paths)]
+                    counts = list(executor.map(_write_chunk_in_worker, *zip(*tasks)))
+                    if self.page_numbers:
+                        starts = [1 + sum(counts[:index]) for index in range(len(chunks))]
+                        redo = [task[:4] + (start,) for task, start in zip(tasks, starts)][1:]
+                        list(executor.map(_write_chunk_in_worker, *zip(*redo)))
+            return merge_pdfs(paths, output_file, title)
+
+    def write_extras(self, output_file, base_url, full_html=None, md_content=None, title=None):
+        """
+        Write the extra formats of a finished PDF.
+
+        full_html is the HTML the PDF was laid out from; it is only rebuilt
+        from md_content when the PDF was laid out in chunks. Thumbnails are
+        rasterised from the PDF itself. Returns {format: path}.
+        """
+        paths = extra_output_paths(output_file, self.extra_formats)
+        if 'html' in paths:
+            if full_html is None:
+                full_html = self.to_html(md_content, title)
+            with open(paths['html'], 'w', encoding='utf-8') as f:
+                f.write(standalone_html(full_html, base_url, paths['html']))
+        if 'png' in paths:
+            write_page_thumbnails(str(output_file), paths['png'], self.thumbnail_width)
+        return paths
+
+    def convert_file(self, input_file, output_file, jobs=1):
+        """
+        Convert one Markdown file to PDF (and any extra formats), raising on errors.
+
+        jobs lays out chunks in parallel when the document is chunked.
+        Returns the size of the PDF in bytes.
+        """
+        with open(input_file, 'r', encoding='utf-8') as f:
+            md_content = f.read()
+        title = Path(input_file).stem
+        base_url = str(Path(input_file).parent.absolute())
+        full_html = None
+        if self.needs_chunking(md_content):
+            # Lay out chunks independently to bound memory, then merge
+            self.write_chunked(md_content, title, base_url, output_file, jobs)
+        else:
+            full_html = self.to_html(md_content, title)
+            self.write_pdf(full_html, output_file, base_url)
+        if self.extra_formats:
+            # Reuse the parsed HTML and the finished PDF instead of running again
+            self.write_extras(output_file, base_url, full_html, md_content, title)
+        return os.path.getsize(output_file)
+
+def convert_markdown_to_pdf(input_file, output_file=None, converter=None, jobs=1,
+                            size_report=False, **converter_options):
+    """
+    Convert Markdown file to PDF (jobs lays out chunks in parallel when chunking).
+
+    size_report prints how much of the output is fonts, images and the rest.
+    """
 
     # Validate input file
     if not os.path.exists(input_file):
@@ -217,56 +982,20 @@ def convert_markdown_to_pdf(input_file, output_file=None):
     print(f"   输出: {output_file}\n")
 
     try:
-        # Read markdown file
-        print("⏳ 读取Markdown文件...")
-        with open(input_file, 'r', encoding='utf-8') as f:
-            md_content = f.read()
+        converter = converter or MarkdownConverter(**converter_options)
 
-        # Convert markdown to HTML with extensions
-        print("🔄 转换Markdown为HTML...")
-        md = markdown.Markdown(extensions=[
-            'fenced_code',
-            'tables',
-            'codehilite',
-            'toc',
-            'nl2br',
-            'sane_lists'
-        ], extension_configs={
-            'codehilite': {
-                'css_class': 'codehilite',
-                'linenums': False,
-                'guess_lang': True
-            }
-        })
-
-        html_content = md.convert(md_content)
-
-        # Wrap in HTML document
-        full_html = f"""
-        <!DOCTYPE html>
-        <html>
-        <head>
-            <meta charset="UTF-8">
-            <title>{Path(input_file).stem}</title>
-        </head>
-        <body>
-            {html_content}
-        </body>
-        </html>
-        """
-
-        # Convert HTML to PDF
-        print("📄 生成PDF...")
-        HTML(string=full_html, base_url=str(Path(input_file).parent.absolute())).write_pdf(
-            output_file,
-            stylesheets=[CSS(string=get_css_style())]
-        )
-
-        # Get file size
-        size_kb = os.path.getsize(output_file) / 1024
+        print("⏳ 生成PDF...")
+        size = converter.convert_file(input_file, output_file, jobs)
+        extras = extra_output_paths(output_file, converter.extra_formats)
 
         print(f"\n✅ 成功生成PDF！")
-        print(f"   大小: {size_kb:.1f} KB")
+        print(f"   大小: {size / 1024:.1f} KB")
+        if size_report:
+            print(f"   📦 构成: {format_size_report(pdf_size_report(output_file))}")
+        if 'html' in extras:
+            print(f"   HTML预览: {extras['html']}")
+        if 'png' in extras:
+            print(f"   页面缩略图: {extras['png']}/")
         print(f"\n💡 打开查看:")
         print(f"   open {output_file}")
 
@@ -278,20 +1007,531 @@ def convert_markdown_to_pdf(input_file, output_file=None):
         traceback.print_exc()
         return False
 
+def expand_markdown_inputs(inputs):
+    """
+    Expand files, directories (searched recursively) and glob patterns.
+
+    Returns a list of (input_file, relative_path) pairs. The relative path is
+    taken from the directory or the non-wildcard prefix of the pattern, so the
+    source layout can be mirrored under an output directory.
+    """
+    pairs = []
+    seen = set()
+    for item in inputs:
+        if os.path.isdir(item):
+            root = item
+            matches = sorted(str(p) for p in Path(item).rglob('*.md'))
+        elif glob.has_magic(item):
+            prefix = item[:min(item.index(c) for c in '*?[' if c in item)]
+            root = os.path.dirname(prefix) or '.'
+            matches = sorted(glob.glob(item, recursive=True))
+        else:
+            root = os.path.dirname(item) or '.'
+            matches = [item]
+        for path in matches:
+            key = os.path.abspath(path)
+            if key not in seen:
+                seen.add(key)
+                pairs.append((path, os.path.relpath(path, root)))
+    return pairs
+
+def plan_outputs(inputs, output_dir=None):
+    """
+    Map inputs (see expand_markdown_inputs) to (input_file, output_pdf) pairs,
+    mirroring the source layout under output_dir or writing next to each input.
+
+    Raises ValueError when two inputs would write the same PDF (for example
+    x/README.md and y/README.md listed as files with one output_dir).
+    """
+    tasks = []
+    claimed = {}
+    for input_file, relative in expand_markdown_inputs(inputs):
+        if output_dir:
+            output_file = Path(output_dir) / Path(relative).with_suffix('.pdf')
+        else:
+            output_file = Path(input_file).with_suffix('.pdf')
+        key = os.path.normcase(os.path.abspath(output_file))
+        if key in claimed:
+            raise ValueError(f"'{claimed[key]}' and '{input_file}' would both be written to "
+                             f"'{output_file}'; pass their parent directory instead")
+        claimed[key] = input_file
+        tasks.append((input_file, str(output_file)))
+    return tasks
+
+# Image references in Markdown: ![alt](src "title"), <img src="...">, [id]: src
+IMAGE_REF_RE = re.compile(
+    r"""!\[[^\]]*\]\(\s*<?([^)\s>]+)|<img\b[^>]*\bsrc\s*=\s*["']([^"']+)["']|^\s*\[[^\]]+\]:\s*<?(\S+?)>?(?:\s|$)""",
+    re.IGNORECASE | re.MULTILINE
+)
+
+DEFAULT_MANIFEST_NAME = '.markdown_to_pdf_manifest.json'
+
+def _hash_file(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def referenced_images(input_file, md_content=None):
+    """
+    Return local files referenced as images by a Markdown file.
+
+    Paths are resolved against the input's directory, the same base_url that
+    is passed to WeasyPrint. Remote and data: URLs are skipped.
+    """
+    if md_content is None:
+        with open(input_file, 'r', encoding='utf-8') as f:
+            md_content = f.read()
+    base = Path(input_file).parent.absolute()
+    paths = []
+    for match in IMAGE_REF_RE.finditer(md_content):
+        ref = next(group for group in match.groups() if group)
+        parts = urlsplit(ref)
+        if parts.scheme not in ('', 'file') or not parts.path:
+            continue
+        path = os.path.normpath(os.path.join(base, unquote(parts.path)))
+        if path not in paths:
+            paths.append(path)
+    return paths
+
+def _tool_versions():
+    """Versions that change the generated PDF (read from metadata, no imports)."""
+    from importlib.metadata import version, PackageNotFoundError
+    versions = {'markdown_to_pdf': __version__}
+    for package in ('markdown', 'weasyprint', 'pygments'):
+        try:
+            versions[package] = version(package)
+        except PackageNotFoundError:
+            versions[package] = None
+    return versions
+
+def build_signature(input_file, versions=None, options=None):
+    """
+    Describe everything an output depends on: input content, referenced
+    images, stylesheet, converter options and tool versions. Missing images
+    hash to None, so adding them later triggers a rebuild.
+    """
+    with open(input_file, 'r', encoding='utf-8') as f:
+        md_content = f.read()
+    images = {}
+    for path in referenced_images(input_file, md_content):
+        images[path] = _hash_file(path) if os.path.isfile(path) else None
+    return {
+        'input_hash': hashlib.sha256(md_content.encode('utf-8')).hexdigest(),
+        'images': images,
+        'css_version': hashlib.sha256(get_css_style().encode('utf-8')).hexdigest()[:16],
+        'options': options or {},
+        'tool_version': versions or _tool_versions(),
+    }
+
+class BuildManifest:
+    """
+    JSON manifest mapping each output PDF to the signature it was built from.
+
+    Used by incremental builds to skip documents whose inputs are unchanged.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                self.entries = json.load(f).get('outputs', {})
+        except (OSError, ValueError):
+            self.entries = {}
+
+    def is_current(self, output_file, signature):
+        entry = self.entries.get(os.path.abspath(output_file))
+        return entry == signature and os.path.exists(output_file)
+
+    def record(self, output_file, signature):
+        self.entries[os.path.abspath(output_file)] = signature
+
+    def save(self):
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump({'version': 1, 'outputs': self.entries}, f, ensure_ascii=False, indent=2)
+        os.replace(tmp, self.path)
+
+def _convert_one(converter, input_file, output_file):
+    """Convert one file and return a result dict instead of raising."""
+    result = {'input': str(input_file), 'output': str(output_file), 'ok': False,
+              'error': None, 'size': None, 'seconds': 0.0, 'worker': os.getpid(),
+              'skipped': False}
+    start = time.perf_counter()
+    try:
+        if not os.path.exists(input_file):
+            raise FileNotFoundError(f"Input file '{input_file}' not found")
+        os.makedirs(os.path.dirname(os.path.abspath(output_file)), exist_ok=True)
+        result['size'] = converter.convert_file(input_file, output_file)
+        result['ok'] = True
+    except Exception as e:
+        result['error'] = str(e)
+    result['seconds'] = time.perf_counter() - start
+    return result
+
+_worker_converter = None
+
+def _init_worker(converter_options):
+    """Build one converter per worker process."""
+    global _worker_converter
+    _worker_converter = MarkdownConverter(**converter_options)
+
+def _convert_in_worker(input_file, output_file):
+    return _convert_one(_worker_converter, input_file, output_file)
+
+def _write_chunk_in_worker(md_content, title, base_url, output_file, first_page):
+    return _worker_converter.write_pdf(_worker_converter.to_html(md_content, title),
+                                       output_file, base_url, first_page)
+
+def convert_markdown_files(inputs, output_dir=None, jobs=1, incremental=False,
+                           manifest_path=None, size_report=False, **converter_options):
+    """
+    Convert many Markdown files, sharing one converter per process.
+
+    Inputs may be files, directories or glob patterns. With output_dir the
+    relative layout of the sources is preserved; otherwise each PDF is written
+    next to its input. jobs > 1 spreads files over that many worker processes
+    (0 means one per CPU). With incremental, documents whose input, images,
+    stylesheet and tool versions match the manifest are skipped. With
+    size_report each converted PDF gets a 'report' from pdf_size_report().
+    Remaining keyword arguments are passed to MarkdownConverter.
+
+    Returns a list of result dicts with input, output, ok, error, size, seconds,
+    worker and skipped, in input order.
+    """
+    tasks = plan_outputs(inputs, output_dir)
+    results = [None] * len(tasks)
+    pending = list(range(len(tasks)))
+    manifest = None
+    signatures = {}
+    if incremental:
+        manifest = BuildManifest(manifest_path or os.path.join(output_dir or '.',
+                                                               DEFAULT_MANIFEST_NAME))
+        versions = _tool_versions()
+        # Options that change the PDF (cache locations do not, but using the
+        # image cache does since it resizes images)
+        output_options = {k: v for k, v in sorted(converter_options.items())
+                          if k != 'highlight_cache'}
+        if output_options.get('image_cache'):
+            output_options['image_cache'] = True
+        pending = []
+        for index, (input_file, output_file) in enumerate(tasks):
+            try:
+                signatures[index] = build_signature(input_file, versions, output_options)
+            except (OSError, ValueError):
+                # Missing, unreadable or undecodable: convert it and let the
+                # per-file error path report the failure
+                pending.append(index)
+                continue
+            if manifest.is_current(output_file, signatures[index]):
+                results[index] = {'input': input_file, 'output': output_file, 'ok': True,
+                                  'error': None, 'size': os.path.getsize(output_file),
+                                  'seconds': 0.0, 'worker': None, 'skipped': True}
+            else:
+                pending.append(index)
+
+    jobs = jobs or os.cpu_count() or 1
+    jobs = max(1, min(jobs, len(pending)))
+
+    print("=" * 70)
+    print(f"Markdown转PDF工具 - 批量转换 {len(pending)} 个文件"
+          + (f"（{jobs} 个进程）" if jobs > 1 else "")
+          + (f"，{len(tasks) - len(pending)} 个未变化已跳过" if len(pending) < len(tasks) else ""))
+    print("=" * 70)
+
+    def report(done, result):
+        status = f"{result['size'] / 1024:.1f} KB" if result['ok'] else result['error']
+        if result['ok'] and size_report:
+            result['report'] = pdf_size_report(result['output'])
+            status = format_size_report(result['report'])
+        print(f"[{done}/{len(pending)}] {'✅' if result['ok'] else '❌'} "
+              f"{result['input']} ({result['seconds']:.2f}s) {status}")
+
+    start = time.perf_counter()
+    if pending and jobs == 1:
+        converter = MarkdownConverter(**converter_options)
+        for done, index in enumerate(pending, 1):
+            results[index] = _convert_one(converter, *tasks[index])
+            report(done, results[index])
+    elif pending:
+        from concurrent.futures import ProcessPoolExecutor, as_completed
+
+        with ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker,
+                                 initargs=(converter_options,)) as executor:
+            futures = {executor.submit(_convert_in_worker, *tasks[index]): index
+                       for index in pending}
+            for done, future in enumerate(as_completed(futures), 1):
+                results[futures[future]] = future.result()
+                report(done, results[futures[future]])
+    wall_seconds = time.perf_counter() - start
+
+    if manifest is not None:
+        for index in pending:
+            if results[index]['ok'] and index in signatures:
+                manifest.record(tasks[index][1], signatures[index])
+        manifest.save()
+
+    print_batch_summary(results, wall_seconds)
+    return results
+
+def print_batch_summary(results, wall_seconds=None):
+    """Print totals, timings and failures for a batch conversion."""
+    succeeded = sum(1 for r in results if r['ok'])
+    skipped = sum(1 for r in results if r.get('skipped'))
+    print(f"\n批量转换完成: 成功 {succeeded} / 共 {len(results)}"
+          + (f"（{skipped} 个未变化已跳过）" if skipped else ""))
+    converted = [r for r in results if not r.get('skipped')]
+    if converted:
+        total_seconds = sum(r['seconds'] for r in converted)
+        slowest = max(converted, key=lambda r: r['seconds'])
+        print(f"   平均每个文件: {total_seconds / len(converted):.2f} 秒，"
+              f"最慢: {slowest['input']} ({slowest['seconds']:.2f} 秒)")
+    if wall_seconds and converted:
+        print(f"   总耗时: {wall_seconds:.2f} 秒（吞吐: {len(converted) / wall_seconds:.2f} 个/秒）")
+    reports = [r['report'] for r in results if r.get('report')]
+    if reports:
+        totals = {key: sum(report[key] for report in reports)
+                  for key in ('bytes', 'pages', 'fonts', 'font_bytes', 'images',
+                              'image_bytes', 'other_bytes')}
+        print(f"   📦 输出合计: {format_size_report(totals)}")
+    for r in results:
+        if not r['ok']:
+            print(f"   ❌ {r['input']}: {r['error']}")
+
+def _file_stamp(path):
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
+
+class FileWatcher:
+    """
+    Tell which of a set of watched files changed.
+
+    With the optional watchdog package (inotify on Linux, FSEvents on macOS)
+    the watcher sleeps until the file system reports activity in a watched
+    directory; otherwise it polls every interval seconds. Either way a change
+    is confirmed by comparing (mtime, size), which also covers editors that
+    save by writing a new file and renaming it over the old one.
+    """
+
+    def __init__(self, interval=0.5):
+        import threading
+        self.interval = interval
+        self.stamps = {}
+        self.directories = set()
+        self.activity = threading.Event()
+        self.observer = None
+        try:
+            from watchdog.observers import Observer
+            from watchdog.events import FileSystemEventHandler
+        except ImportError:
+            return
+        self.handler = FileSystemEventHandler()
+        self.handler.on_any_event = lambda event: self.activity.set()
+        self.observer = Observer()
+        self.observer.daemon = True
+        self.observer.start()
+
+    def watch(self, paths):
+        """Start watching paths (files that don't exist yet are fine)."""
+        for path in paths:
+            if path not in self.stamps:
+                self.stamps[path] = _file_stamp(path)
+            directory = os.path.dirname(path)
+            if self.observer and directory not in self.directories and os.path.isdir(directory):
+                self.observer.schedule(self.handler, directory, recursive=False)
+                self.directories.add(directory)
+
+    def changes(self):
+        """Return watched paths whose stamp changed since the last call."""
+        changed = []
+        for path, stamp in self.stamps.items():
+            current = _file_stamp(path)
+            if current != stamp:
+                self.stamps[path] = current
+                changed.append(path)
+        return changed
+
+    def wait(self, debounce=0.2):
+        """
+        Block until watched files change, then keep collecting changes until
+        none arrive for debounce seconds. Returns the changed paths.
+        """
+        changed = set()
+        while not changed:
+            # Poll now and then even with watchdog, for directories created later
+            self.activity.wait(self.interval if self.observer is None else 5.0)
+            self.activity.clear()
+            changed.update(self.changes())
+        while True:
+            time.sleep(debounce)
+            more = self.changes()
+            if not more:
+                return changed
+            changed.update(more)
+
+    def close(self):
+        if self.observer is not None:
+            self.observer.stop()
+
+def watch_markdown(tasks, interval=0.5, debounce=0.2, **converter_options):
+    """
+    Render (input_file, output_pdf) pairs, then re-render on every save.
+
+    One warm MarkdownConverter is kept for the whole session. Each input is
+    watched together with the local images it references; a change re-renders
+    only the documents that use the changed file, and the latency from the
+    save to the finished PDF is printed. Runs until interrupted.
+    """
+    converter = MarkdownConverter(**converter_options)
+    watcher = FileWatcher(interval)
+    inputs = {os.path.abspath(input_file) for input_file, _ in tasks}
+    dependents = {}
+    latencies = []
+
+    def render(index):
+        input_file, output_file = tasks[index]
+        start = time.perf_counter()
+        result = _convert_one(converter, input_file, output_file)
+        # Images may have been added or removed in this save. Keep watching
+        # the input even when it can't be read, so fixing it re-renders
+        paths = [os.path.abspath(input_file)]
+        try:
+            paths += referenced_images(input_file)
+        except (OSError, ValueError):
+            pass
+        for path in paths:
+            dependents.setdefault(path, set()).add(index)
+        watcher.watch(paths)
+        return result, time.perf_counter() - start
+
+    print("=" * 70)
+    print(f"Markdown转PDF工具 - 监视模式（{len(tasks)} 个文件）"
+          + ("" if watcher.observer else f"，每 {interval:g} 秒轮询"))
+    print("=" * 70)
+    for index in range(len(tasks)):
+        result, seconds = render(index)
+        status = f"{result['size'] / 1024:.1f} KB" if result['ok'] else result['error']
+        print(f"{'✅' if result['ok'] else '❌'} {result['input']} ({seconds:.2f}s) {status}")
+    print("\n👀 正在监视文件变化，按 Ctrl+C 退出")
+
+    try:
+        while True:
+            changed = watcher.wait(debounce)
+            saved_at = max((stamp[0] / 1e9 for stamp in map(_file_stamp, changed) if stamp),
+                           default=time.time())
+            if any(path not in inputs for path in changed):
+                # WeasyPrint caches decoded images by URL; drop them after an image changes
+                converter.images.clear()
+            affected = sorted(set().union(*(dependents.get(path, ()) for path in changed)))
+            for index in affected:
+                result, seconds = render(index)
+                latency = time.time() - saved_at
+                stamp = time.strftime('%H:%M:%S')
+                if result['ok']:
+                    latencies.append(latency)
+                    print(f"🔁 [{stamp}] {result['input']} 渲染 {seconds:.2f}s，"
+                          f"保存到生成 {latency:.2f}s")
+                else:
+                    print(f"❌ [{stamp}] {result['input']}: {result['error']}")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        watcher.close()
+    if latencies:
+        latencies.sort()
+        print(f"\n监视结束: 重新生成 {len(latencies)} 次，保存到生成中位数 "
+              f"{latencies[len(latencies) // 2]:.2f}s，最慢 {latencies[-1]:.2f}s")
+
 def main():
     """Main entry point."""
-    if len(sys.argv) < 2:
-        print("Usage: python markdown_to_pdf.py input.md [output.pdf]")
-        print("\nExamples:")
-        print("  python markdown_to_pdf.py README.md")
-        print("  python markdown_to_pdf.py docs.md custom_output.pdf")
-        sys.exit(1)
-
-    input_file = sys.argv[1]
-    output_file = sys.argv[2] if len(sys.argv) > 2 else None
-
-    success = convert_markdown_to_pdf(input_file, output_file)
-    sys.exit(0 if success else 1)
+    parser = argparse.ArgumentParser(
+        description='Convert Markdown files to PDF',
+        epilog='Examples:\n'
+               '  python markdown_to_pdf.py README.md\n'
+               '  python markdown_to_pdf.py docs.md custom_output.pdf\n'
+               '  python markdown_to_pdf.py docs/*.md --output-dir pdf/\n'
+               '  python markdown_to_pdf.py docs/ --output-dir pdf/ --jobs 8\n'
+               '  python markdown_to_pdf.py README.md --watch',
+        formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument('inputs', nargs='+', help='Input Markdown files, directories or glob patterns, optionally followed by an output PDF path for a single input')
+    parser.add_argument('--output-dir', help='Output directory for batch conversion, mirroring the input layout (default: next to each input)')
+    parser.add_argument('--jobs', '-j', type=int, default=1, help='Number of worker processes (0 = one per CPU, default: 1)')
+    parser.add_argument('--incremental', action='store_true', help='Only reconvert documents whose Markdown, images, stylesheet or tool versions changed')
+    parser.add_argument('--manifest', help=f'Manifest path for --incremental (default: <output-dir>/{DEFAULT_MANIFEST_NAME})')
+    parser.add_argument('--highlight-cache', nargs='?', const=DEFAULT_HIGHLIGHT_CACHE_DIR, metavar='DIR', help=f'Persist highlighted code blocks across runs (default dir: {DEFAULT_HIGHLIGHT_CACHE_DIR})')
+    parser.add_argument('--guess-limit', type=int, default=DEFAULT_GUESS_LIMIT, help='Only guess the language of unlabelled code blocks up to this many characters (0 = never guess, default: %(default)s)')
+    parser.add_argument('--chunked', action='store_true', help='Lay out long documents in chunks split at top-level headings to bound memory')
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_CHARS, help='Target chunk size in characters for --chunked (default: %(default)s)')
+    parser.add_argument('--page-numbers', action='store_true', help='Add page numbers to the page footer (continuous across chunks)')
+    parser.add_argument('--image-dpi', type=int, help='Downsample images above this resolution at their printed size (e.g. 150 for screen, 300 for print)')
+    parser.add_argument('--jpeg-quality', type=int, help='Re-encode JPEG images at this quality (0-95)')
+    parser.add_argument('--optimize-images', action='store_true', help='Recompress images losslessly where it makes them smaller')
+    parser.add_argument('--optimize', action='store_true', help='Size preset for distribution: --optimize-images with --image-dpi 150 and --jpeg-quality 85 unless given')
+    parser.add_argument('--full-fonts', action='store_true', help='Embed complete font files instead of subsets of the glyphs used')
+    parser.add_argument('--hinting', action='store_true', help='Keep hinting tables in embedded font subsets (sharper on low-res screens, larger files)')
+    parser.add_argument('--image-cache', nargs='?', const=DEFAULT_IMAGE_CACHE_DIR, metavar='DIR', help=f'Decode, downscale and recompress each distinct image once and reuse it across documents and runs (default dir: {DEFAULT_IMAGE_CACHE_DIR})')
+    parser.add_argument('--html', action='store_true', help='Also write a standalone HTML preview (<name>.html) from the same parse')
+    parser.add_argument('--thumbnails', action='store_true', help='Also write PNG page thumbnails (<name>_pages/page-001.png, ...) from the same layout')
+    parser.add_argument('--thumbnail-width', type=int, default=DEFAULT_THUMBNAIL_WIDTH, help='Thumbnail width in pixels (default: %(default)s)')
+    parser.add_argument('--watch', action='store_true', help='Keep running and re-render a document whenever it or an image it references is saved')
+    parser.add_argument('--watch-interval', type=float, default=0.5, help='Polling interval in seconds for --watch when the watchdog package is not installed (default: %(default)s)')
+    parser.add_argument('--size-report', action='store_true', help='Report how much of each PDF is fonts, images and other content')
+    args = parser.parse_args()
+    if args.optimize:
+        args.optimize_images = True
+        args.image_dpi = args.image_dpi or 150
+        args.jpeg_quality = args.jpeg_quality or 85
+    converter_options = {'highlight_cache': args.highlight_cache, 'guess_limit': args.guess_limit,
+                         'chunk_chars': args.chunk_size if args.chunked else None,
+                         'page_numbers': args.page_numbers, 'image_dpi': args.image_dpi,
+                         'jpeg_quality': args.jpeg_quality,
+                         'optimize_images': args.optimize_images,
+                         'full_fonts': args.full_fonts, 'hinting': args.hinting,
+                         'image_cache': args.image_cache,
+                         'extra_formats': [name for name, wanted in (('html', args.html), ('png', args.thumbnails)) if wanted],
+                         'thumbnail_width': args.thumbnail_width}
+
+    inputs = args.inputs
+    # A trailing .pdf is the output path of a single input, never an input
+    output_file = None
+    if inputs[-1].lower().endswith('.pdf'):
+        inputs, output_file = inputs[:-1], inputs[-1]
+        if len(inputs) != 1 or os.path.isdir(inputs[0]) or glob.has_magic(inputs[0]):
+            parser.error('an output PDF path can only follow a single input file')
+        if args.output_dir:
+            parser.error('give either an output PDF path or --output-dir, not both')
+        if args.incremental:
+            parser.error('--incremental writes next to each input or into --output-dir')
+
+    try:
+        tasks = [(inputs[0], output_file)] if output_file else plan_outputs(inputs, args.output_dir)
+    except ValueError as e:
+        parser.error(str(e))
+
+    if args.watch:
+        if not tasks:
+            parser.error('no Markdown files to watch')
+        watch_markdown(tasks, args.watch_interval, **converter_options)
+        sys.exit(0)
+
+    # A single file with --chunked uses --jobs for its chunks
+    single = len(inputs) == 1 and not os.path.isdir(inputs[0]) and not glob.has_magic(inputs[0])
+    jobs_batch = args.jobs != 1 and not args.chunked
+    if output_file or (single and not (args.output_dir or jobs_batch or args.incremental)):
+        success = convert_markdown_to_pdf(inputs[0], output_file, jobs=args.jobs or os.cpu_count(),
+                                          size_report=args.size_report, **converter_options)
+        sys.exit(0 if success else 1)
+
+    results = convert_markdown_files(inputs, args.output_dir, args.jobs,
+                                     args.incremental, args.manifest, args.size_report,
+                                     **converter_options)
+    sys.exit(0 if all(r['ok'] for r in results) else 1)
 
 if __name__ == '__main__':
     main()
@@ -6,11 +6,19 @@ Converts Markdown files to beautiful presentation PDFs using Marp CLI.
 
 import sys
 import os
+import glob
+import time
 import subprocess
 import shutil
+import tempfile
 from pathlib import Path
 import argparse
 
+from markdown_to_pdf import expand_markdown_inputs, plan_outputs
+
+# Seconds allowed per deck; a batch gets this budget for each of its decks
+DECK_TIMEOUT = 60
+
 def check_marp_cli():
     """Check if Marp CLI is installed."""
     # Try marp-cli
@@ -33,6 +41,12 @@ def check_marp_cli():
 
     return None
 
+def marp_command(marp_cmd):
+    """Base command line for the Marp CLI found by check_marp_cli()."""
+    if marp_cmd == 'marp':
+        return ['marp']
+    return ['npx', '@marp-team/marp-cli']
+
 def install_instructions():
     """Print installation instructions."""
     print("\n❌ Marp CLI not found!")
@@ -73,11 +87,7 @@ def convert_markdown_to_pdf(input_file, output_file=None, theme='default', html_
 
     try:
         # Build Marp command
-        if marp_cmd == 'marp':
-            cmd = ['marp']
-        else:  # npx
-            cmd = ['npx', '@marp-team/marp-cli']
-
+        cmd = marp_command(marp_cmd)
         cmd.extend([
             input_file,
             '--pdf',
@@ -148,6 +158,132 @@ def convert_markdown_to_pdf(input_file, output_file=None, theme='default', html_
         traceback.print_exc()
         return False
 
+def _marp_args(decks, input_dir, output, suffix):
+    """
+    Marp arguments converting decks to suffix ('.pdf' or '.html'): the decks
+    themselves, or with input_dir every Markdown file under it into output.
+    """
+    args = ['--pdf'] if suffix == '.pdf' else []
+    if input_dir:
+        return args + ['--input-dir', input_dir, '--output', output]
+    return args + decks
+
+def _run_marp(cmd, outputs, timeout):
+    """
+    Run one Marp invocation that should write outputs ({deck: output path}).
+    Returns {deck: error or None}.
+    """
+    started = time.time()
+    failure = None
+    try:
+        result = subprocess.run(cmd, capture_output=True, text=True, timeout=timeout)
+        if result.returncode != 0:
+            lines = result.stderr.strip().splitlines()
+            failure = lines[-1] if lines else f'Marp exited with code {result.returncode}'
+    except subprocess.TimeoutExpired:
+        failure = f'转换超时（{timeout} 秒）'
+    errors = {}
+    for deck, output in outputs.items():
+        # Marp keeps going after a failed deck, so judge each deck by its output
+        fresh = output.exists() and output.stat().st_mtime >= started - 1
+        errors[deck] = None if fresh else failure or 'Marp did not write an output'
+    return errors
+
+def _run_marp_pass(cmd, tasks, output_dir, staging, suffix, timeout):
+    """
+    Convert every deck to suffix with a single Marp invocation.
+
+    Without output_dir Marp writes each output next to its input. Otherwise
+    Marp converts the decks' common root directory (--input-dir) into
+    staging, and the outputs of the selected decks are moved to their place
+    under output_dir. Returns {deck: error or None}.
+    """
+    decks = [deck for deck, _ in tasks]
+    if not output_dir:
+        outputs = {deck: Path(deck).with_suffix(suffix) for deck in decks}
+        return _run_marp(cmd + _marp_args(decks, None, None, suffix), outputs, timeout)
+
+    root = os.path.commonpath([os.path.dirname(os.path.abspath(deck)) for deck in decks])
+    outputs = {deck: Path(staging, os.path.relpath(os.path.abspath(deck), root))
+               .with_suffix(suffix) for deck in decks}
+    errors = _run_marp(cmd + _marp_args(decks, root, staging, suffix), outputs, timeout)
+    for deck, output in tasks:
+        if errors[deck] is None:
+            target = Path(output).with_suffix(suffix)
+            target.parent.mkdir(parents=True, exist_ok=True)
+            os.replace(outputs[deck], target)
+    return errors
+
+def convert_markdown_files(inputs, output_dir=None, theme='default', html_output=False,
+                           parallel=None, timeout=None):
+    """
+    Convert many Marp decks with a single Marp CLI invocation.
+
+    Inputs may be files, directories or glob patterns. Marp starts Node and
+    its headless browser once for the whole batch instead of once per deck
+    (a second invocation renders the HTML versions when html_output is set).
+    parallel is passed to Marp's --parallel option (Marp CLI 3.1+). With
+    output_dir the outputs mirror the input layout there; Marp renders every
+    Markdown file under the decks' common directory into a staging directory
+    and only the selected decks are kept, so sources are never written to.
+
+    Raises ValueError when two inputs would write the same output.
+    Returns a list of result dicts with input, output, ok, error and size.
+    """
+    tasks = [(deck, Path(output)) for deck, output in plan_outputs(inputs, output_dir)]
+    results = []
+    if not tasks:
+        print("❌ 没有找到Markdown文件")
+        return results
+
+    marp_cmd = check_marp_cli()
+    if not marp_cmd:
+        install_instructions()
+        return [{'input': deck, 'output': None, 'ok': False, 'error': 'Marp CLI not found',
+                 'size': None} for deck, _ in tasks]
+
+    timeout = timeout or DECK_TIMEOUT * len(tasks)
+    cmd = marp_command(marp_cmd) + ['--allow-local-files', '--theme', theme]
+    if parallel:
+        cmd += ['--parallel', str(parallel)]
+
+    print("=" * 70)
+    print(f"Marp Markdown转PDF工具 - 批量转换 {len(tasks)} 个文件（一次Marp调用）")
+    print("=" * 70)
+    start = time.perf_counter()
+    staging = None
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+        staging = tempfile.mkdtemp(prefix='.marp-', dir=output_dir)
+    try:
+        print("⏳ 生成PDF...")
+        errors = _run_marp_pass(cmd, tasks, output_dir, staging, '.pdf', timeout)
+        if html_output:
+            print("📄 生成HTML版本...")
+            html_errors = _run_marp_pass(cmd, tasks, output_dir, staging, '.html', timeout)
+    finally:
+        if staging:
+            shutil.rmtree(staging, ignore_errors=True)
+    seconds = time.perf_counter() - start
+
+    for deck, output in tasks:
+        result = {'input': deck, 'output': str(output), 'ok': errors[deck] is None,
+                  'error': errors[deck], 'size': None}
+        if result['ok']:
+            result['size'] = os.path.getsize(output)
+            status = f"{result['size'] / 1024:.1f} KB"
+            if html_output and html_errors[deck]:
+                status += f"（HTML失败: {html_errors[deck]}）"
+            print(f"✅ {deck} → {output} {status}")
+        else:
+            print(f"❌ {deck}: {result['error']}")
+        results.append(result)
+
+    succeeded = sum(1 for r in results if r['ok'])
+    print(f"\n批量转换完成: 成功 {succeeded} / 共 {len(results)}，"
+          f"总耗时 {seconds:.1f} 秒（平均每个 {seconds / len(results):.2f} 秒）")
+    return results
+
 def ensure_marp_frontmatter(input_file):
     """Check if Markdown has Marp frontmatter, add if missing."""
     with open(input_file, 'r', encoding='utf-8') as f:
@@ -176,8 +312,7 @@ def main():
     parser = argparse.ArgumentParser(
         description='Convert Markdown to PDF presentation using Marp'
     )
-    parser.add_argument('input', help='Input Markdown file')
-    parser.add_argument('output', nargs='?', help='Output PDF file (optional)')
+    parser.add_argument('inputs', nargs='+', help='Input Markdown files, directories or glob patterns, optionally followed by an output PDF path for a single input')
     parser.add_argument(
         '--theme',
         choices=['default', 'gaia', 'uncover'],
@@ -194,17 +329,47 @@ def main():
         action='store_true',
         help='Add Marp frontmatter if missing'
     )
+    parser.add_argument(
+        '--output-dir',
+        help='Output directory for batch conversion, mirroring the input layout (default: next to each input)'
+    )
+    parser.add_argument(
+        '--parallel',
+        type=int,
+        help="Decks Marp converts concurrently in batch mode (Marp CLI's --parallel, default: Marp's own)"
+    )
+    parser.add_argument(
+        '--timeout',
+        type=int,
+        help=f'Timeout in seconds for the whole batch (default: {DECK_TIMEOUT} per deck)'
+    )
 
     args = parser.parse_args()
+    inputs = args.inputs
+    single_output = len(inputs) == 2 and inputs[1].lower().endswith('.pdf')
+    batch = (args.output_dir or (len(inputs) > 1 and not single_output)
+             or os.path.isdir(inputs[0]) or glob.has_magic(inputs[0]))
 
     # Add frontmatter if requested
-    if args.add_frontmatter:
-        if ensure_marp_frontmatter(args.input):
+    if args.add_frontmatter and batch:
+        for deck, _ in expand_markdown_inputs(inputs):
+            if ensure_marp_frontmatter(deck):
+                print(f"✅ 已添加Marp前置元数据: {deck}")
+    elif args.add_frontmatter:
+        if ensure_marp_frontmatter(inputs[0]):
             print("✅ 已添加Marp前置元数据\n")
 
+    if batch:
+        try:
+            results = convert_markdown_files(inputs, args.output_dir, args.theme, args.html,
+                                             args.parallel, args.timeout)
+        except ValueError as e:
+            parser.error(str(e))
+        sys.exit(0 if results and all(r['ok'] for r in results) else 1)
+
     success = convert_markdown_to_pdf(
-        args.input,
-        args.output,
+        inputs[0],
+        inputs[1] if single_output else None,
         args.theme,
         args.html
     )